@@ -0,0 +1,26 @@
+"""Add created indexes
+
+Revision ID: 08789f8cbff8
+Revises: 951ac1c702de
+Create Date: 2026-10-19 09:12:40.118625
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "08789f8cbff8"
+down_revision = "951ac1c702de"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # serve the default ORDER BY created DESC, id DESC of paginated lists
+    op.create_index("questions_created_id_idx", "questions", ["created", "id"], unique=False)
+    op.create_index("users_created_id_idx", "users", ["created", "id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("users_created_id_idx", table_name="users")
+    op.drop_index("questions_created_id_idx", table_name="questions")
@@ -0,0 +1,85 @@
+"""Move comments to their own table
+
+Revision ID: 951ac1c702de
+Revises: ab759ebbd843
+Create Date: 2026-10-19 08:05:12.401233
+
+"""
+
+import base64
+import os
+import time
+from datetime import timedelta
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "951ac1c702de"
+down_revision = "ab759ebbd843"
+branch_labels = None
+depends_on = None
+
+questions = sa.table("questions", sa.column("id"), sa.column("created"), sa.column("comments", sa.JSON))
+comments = sa.table(
+    "comments", sa.column("id"), sa.column("question_id"), sa.column("email"), sa.column("message"), sa.column("created")
+)
+
+# the app's sortable id as of this revision, kept here so that the migration doesn't import (or depend on) app code
+SORTABLE_ID_TRANSLATION = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", "0123456789ABCDEFGHJKMNPQRSTVWXYZ")
+
+
+def sortable_id():
+    data = (time.time_ns() // 1_000_000).to_bytes(6, "big") + os.urandom(10)
+    return base64.b32encode(data)[:26].decode().translate(SORTABLE_ID_TRANSLATION)
+
+
+def upgrade():
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Text(), nullable=False),
+        sa.Column("question_id", sa.Text(), nullable=False),
+        sa.Column("email", sa.Text(), nullable=True),
+        sa.Column("message", sa.Text(), nullable=True),
+        sa.Column("created", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["question_id"], ["questions.id"], name=op.f("comments_question_id_questions_fkey"), ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("comments_pkey")),
+    )
+    op.create_index(op.f("comments_id_idx"), "comments", ["id"], unique=False)
+    op.create_index("comments_question_id_created_id_idx", "comments", ["question_id", "created", "id"], unique=False)
+    op.add_column("questions", sa.Column("comment_count", sa.Integer(), server_default="0", nullable=False))
+
+    # comments had no timestamps, keep their order by spacing them a microsecond apart from the question creation
+    bind = op.get_bind()
+    for question_id, created, data in bind.execute(
+        sa.select([questions.c.id, questions.c.created, questions.c.comments]).where(questions.c.comments.isnot(None))
+    ).fetchall():
+        rows = [
+            {
+                "id": sortable_id(),
+                "question_id": question_id,
+                "email": comment.get("email"),
+                "message": comment.get("message"),
+                "created": created + timedelta(microseconds=i),
+            }
+            for i, comment in enumerate(data or [])
+        ]
+        if rows:
+            bind.execute(comments.insert(), rows)
+    op.execute("UPDATE questions SET comment_count = (SELECT count(*) FROM comments WHERE question_id = questions.id)")
+    op.drop_column("questions", "comments")
+
+
+def downgrade():
+    op.add_column("questions", sa.Column("comments", sa.JSON(), nullable=True))
+    op.execute(
+        "UPDATE questions SET comments = (SELECT json_agg(json_build_object('email', email, 'message', message) "
+        "ORDER BY created, id) FROM comments WHERE question_id = questions.id)"
+    )
+    op.drop_column("questions", "comment_count")
+    op.drop_index("comments_question_id_created_id_idx", table_name="comments")
+    op.drop_index(op.f("comments_id_idx"), table_name="comments")
+    op.drop_table("comments")
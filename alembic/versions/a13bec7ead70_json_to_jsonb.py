@@ -0,0 +1,43 @@
+"""Convert JSON columns to JSONB
+
+Revision ID: a13bec7ead70
+Revises: a17a5c089ec5
+Create Date: 2026-10-19 11:20:15.402871
+
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a13bec7ead70"
+down_revision = "a17a5c089ec5"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [("users", "settings"), ("users", "metadata"), ("questions", "metadata"), ("tokens", "metadata")]
+METADATA_INDEXES = ["users", "questions"]  # tables listed with meta.key:value filters, tokens aren't
+
+
+def upgrade():
+    for table, column in COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), postgresql_using=f"{column}::jsonb")
+    # jsonb_path_ops only serves @> containment, which is all meta.key:value compiles to, in a smaller index
+    for table in METADATA_INDEXES:
+        op.create_index(
+            f"{table}_metadata_idx",
+            table,
+            ["metadata"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        )
+
+
+def downgrade():
+    for table in reversed(METADATA_INDEXES):
+        op.drop_index(f"{table}_metadata_idx", table_name=table)
+    for table, column in reversed(COLUMNS):
+        op.alter_column(table, column, type_=sa.JSON(), postgresql_using=f"{column}::json")
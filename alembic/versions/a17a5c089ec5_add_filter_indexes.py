@@ -0,0 +1,31 @@
+"""Add filter indexes
+
+Revision ID: a17a5c089ec5
+Revises: 08789f8cbff8
+Create Date: 2026-10-19 09:48:03.552017
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a17a5c089ec5"
+down_revision = "08789f8cbff8"
+branch_labels = None
+depends_on = None
+
+QUESTION_FILTERS = ["topic", "company", "difficulty"]
+
+
+def upgrade():
+    # topic:x company:x difficulty:x filters, with the pagination order after the filtered column
+    for column in QUESTION_FILTERS:
+        op.create_index(f"questions_{column}_created_id_idx", "questions", [column, "created", "id"], unique=False)
+    # tokens are append-only, so created follows the physical order and a tiny BRIN index serves date ranges
+    op.create_index("tokens_created_idx", "tokens", ["created"], unique=False, postgresql_using="brin")
+
+
+def downgrade():
+    op.drop_index("tokens_created_idx", table_name="tokens")
+    for column in reversed(QUESTION_FILTERS):
+        op.drop_index(f"questions_{column}_created_id_idx", table_name="questions")
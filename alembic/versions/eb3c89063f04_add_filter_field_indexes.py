@@ -0,0 +1,31 @@
+"""Add filter field indexes
+
+Revision ID: eb3c89063f04
+Revises: a13bec7ead70
+Create Date: 2026-10-19 12:05:41.736204
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "eb3c89063f04"
+down_revision = "a13bec7ead70"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # name:x* and email:x* prefix filters, LIKE 'x%' can't use a btree in the database collation
+    op.create_index(
+        "questions_name_pattern_idx", "questions", ["name"], unique=False, postgresql_ops={"name": "text_pattern_ops"}
+    )
+    op.create_index("users_email_pattern_idx", "users", ["email"], unique=False, postgresql_ops={"email": "text_pattern_ops"})
+    # solutions:email, questions solved by a user
+    op.create_index("questions_solutions_idx", "questions", ["solutions"], unique=False, postgresql_using="gin")
+
+
+def downgrade():
+    op.drop_index("questions_solutions_idx", table_name="questions")
+    op.drop_index("users_email_pattern_idx", table_name="users")
+    op.drop_index("questions_name_pattern_idx", table_name="questions")
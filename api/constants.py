@@ -1,8 +1,20 @@
 import string
 
 EVENTS_CHANNEL = "events"  # default redis channel for event system (inter-process communication)
+SETTINGS_CHANNEL = "settings"  # postgres NOTIFY channel to reload cached settings in all workers
+FEED_CHANNEL = "question_events"  # postgres NOTIFY channel of live question events, see utils.feed
+GET_MANY_MAX_IDS = 100  # ids per multi-get request, larger sets should be paginated
+FIELDS_DESCRIPTION = (
+    "Comma-separated list of fields to return, all by default. Returned objects then only have the listed fields, "
+    "not all the fields of the response schema"
+)  # `fields` query parameter of list and get endpoints
+# scopes checked by the API, others are interned when seen in user permissions (see utils.authorization)
+SCOPES = ("full_control", "admin_access", "token_management")
 ALPHABET = string.ascii_letters  # used by ID generator
 ID_LENGTH = 32  # default length of IDs of all objects
+# time-ordered IDs: base32 in an alphabet which sorts the same way as the encoded bits
+SORTABLE_ID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford's base32
+SORTABLE_ID_LENGTH = 26  # 48 bits of milliseconds + 80 random bits, like ULID
 STR_TO_BOOL_MAPPING = {
     "true": True,
     "yes": True,
@@ -1,6 +1,7 @@
 """Event system for gunicorn workers/background worker communication via redis pub/sub."""
 
 import asyncio
+import time
 
 from pydantic import ValidationError
 
@@ -52,12 +53,14 @@ async def process_message(message, custom_event_handler=None):
         message = schemes.EventSystemMessage(**message)
     except (TypeError, ValidationError):
         return
+    if message.sent is not None:
+        utils.metrics.EVENT_LAG.labels(message.event).observe(max(0, time.time() - message.sent))
     custom_event_handler = custom_event_handler or event_handler
     await custom_event_handler.process(message)
 
 
 async def send_message(message):
-    await utils.redis.publish_message(constants.EVENTS_CHANNEL, message)
+    await utils.redis.publish_message(constants.EVENTS_CHANNEL, {**message, "sent": time.time()})
 
 
 async def listen(channel, custom_event_handler=None):  # pragma: no cover
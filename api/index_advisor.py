@@ -0,0 +1,280 @@
+"""Index advisor: replays captured query shapes with EXPLAIN and reports sequential scans and sorts an index could serve.
+
+Query shapes come from the slow request log written in profiling mode (PROFILING_ENABLED, see utils.profiling) and,
+if the extension is installed, from pg_stat_statements. Their parameter values aren't captured, so they are prepared
+and explained as generic plans; --analyze runs EXPLAIN ANALYZE, in a rolled back transaction, for shapes without
+parameters. Suggestions are heuristic: review them before writing a migration.
+
+Run with ``make index-advisor`` or ``python -m api.index_advisor [--log slow_requests.log ...] [--analyze]``
+against the database configured by DB_* variables.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import asyncpg
+
+from api.settings import Settings
+from api.utils.profiling import PARAM_RE, normalize_query
+
+EXPLAINABLE = ("select", "with", "update", "delete")
+CONDITION_RE = re.compile(r'"?(\w+)"?\)?(?:::[\w ]+(?:\[\])?)?\s+(=|<>|>=|<=|>|<|~~\*|~~|~\*|~)\s')
+EQUALITY_OPS = {"="}
+RANGE_OPS = {">=", "<=", ">", "<"}
+PATTERN_OPS = {"~~*", "~~", "~*", "~"}
+
+TABLES_QUERY = """
+SELECT c.relname AS table, c.reltuples AS rows, array_agg(a.attname::text) AS columns
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+WHERE c.relkind = 'r' AND n.nspname = 'public'
+GROUP BY c.relname, c.reltuples
+"""
+INDEXES_QUERY = """
+SELECT t.relname AS table, i.relname AS index, array_agg(a.attname::text ORDER BY k.position) AS columns
+FROM pg_index x
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, position)
+JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+WHERE n.nspname = 'public'
+GROUP BY t.relname, i.relname
+"""
+PG_STAT_STATEMENTS_QUERY = """
+SELECT query, calls, total_exec_time / 1000 AS duration FROM pg_stat_statements ORDER BY total_exec_time DESC LIMIT $1
+"""
+
+
+@dataclass
+class Shape:
+    query: str  # a representative statement, normalized IN lists can't be explained
+    calls: int = 0
+    duration: float = 0.0
+
+
+@dataclass
+class Suggestion:
+    table: str
+    columns: tuple
+    reason: str
+    existing_index: str | None = None
+    shapes: list = field(default_factory=list)
+
+    @property
+    def duration(self):
+        return sum(shape.duration for shape in self.shapes)
+
+    @property
+    def statement(self):
+        return f"CREATE INDEX ON {self.table} ({', '.join(self.columns)})"
+
+
+def load_log_shapes(paths, shapes):
+    for path in paths:
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            print(f"Slow request log {path} not found, skipping")
+            continue
+        for line in lines:
+            for query in json.loads(line)["queries"]:
+                shape = shapes.setdefault(normalize_query(query["query"]), Shape(query["query"]))
+                shape.calls += 1
+                shape.duration += query["duration"]
+
+
+async def load_pg_stat_statements(conn, shapes, limit):
+    try:
+        rows = await conn.fetch(PG_STAT_STATEMENTS_QUERY, limit)
+    except (asyncpg.UndefinedTableError, asyncpg.ObjectNotInPrerequisiteStateError):
+        print("pg_stat_statements is not available, skipping")
+        return
+    for row in rows:
+        shape = shapes.setdefault(normalize_query(row["query"]), Shape(row["query"]))
+        shape.calls += row["calls"]
+        shape.duration += row["duration"]
+
+
+async def explain(conn, query, analyze=False):
+    params = {int(param[1:]) for param in PARAM_RE.findall(query)}
+    if params:
+        # planned without values as plan_cache_mode is force_generic_plan, so the NULLs don't fold into the plan
+        await conn.execute(f"PREPARE index_advisor AS {query}")
+        try:
+            plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) EXECUTE index_advisor({', '.join(['NULL'] * max(params))})")
+        finally:
+            await conn.execute("DEALLOCATE index_advisor")
+        return json.loads(plan)[0]["Plan"]
+    if not analyze:
+        return json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}"))[0]["Plan"]
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        return json.loads(await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"))[0]["Plan"]
+    finally:
+        await transaction.rollback()
+
+
+def walk(plan, parents=()):
+    yield plan, parents
+    for child in plan.get("Plans", []):
+        yield from walk(child, (*parents, plan))
+
+
+def get_conditions(expression, columns):
+    """Split the columns compared in a filter into (equality, range, pattern) ones"""
+    conditions = defaultdict(set)
+    for column, op in CONDITION_RE.findall(expression or ""):
+        if column in columns:
+            conditions[column].add(op)
+    equality = [column for column, ops in conditions.items() if ops & EQUALITY_OPS]
+    ranges = [column for column, ops in conditions.items() if ops & RANGE_OPS and column not in equality]
+    patterns = [column for column, ops in conditions.items() if ops & PATTERN_OPS]
+    return equality, ranges, patterns
+
+
+def get_sort_columns(sort_keys, columns):
+    # i.e. "questions.created DESC" -> created
+    sort_columns = [key.split()[0].rsplit(".", 1)[-1].strip('"') for key in sort_keys]
+    return [column for column in sort_columns if column in columns]
+
+
+def analyze_sort(node, parents, tables, min_rows):
+    if not any(parent["Node Type"] == "Limit" for parent in parents):
+        return  # only ORDER BY ... LIMIT gains from reading an index in order, i.e. not sorts for DISTINCT
+    scan = next((child for child, _ in walk(node) if "Relation Name" in child), None)
+    table = tables.get(scan["Relation Name"]) if scan else None
+    if table is None or scan["Node Type"] != "Seq Scan" or table["rows"] < min_rows:
+        return
+    equality, _, _ = get_conditions(scan.get("Filter"), table["columns"])
+    sort_columns = get_sort_columns(node.get("Sort Key", []), table["columns"])
+    columns = equality + [column for column in sort_columns if column not in equality]
+    if columns:
+        yield scan["Relation Name"], tuple(columns), "sort after a sequential scan"
+
+
+def analyze_scan(node, table, index_columns):
+    equality, ranges, patterns = get_conditions(node.get("Filter"), table["columns"])
+    if node["Node Type"] == "Seq Scan":
+        if equality or ranges:
+            yield node["Relation Name"], tuple(equality + ranges[:1]), "filtered sequential scan"
+        elif patterns:
+            yield node["Relation Name"], (), "regex/LIKE filter, a btree can't serve it (consider pg_trgm)"
+        return
+    # an index scan which filters rows by a column outside of the index, i.e. a sort-only index
+    missing = [column for column in equality if column not in index_columns]
+    if missing:
+        reason = f"{node['Index Name']} scan filters {', '.join(missing)} row by row"
+        yield node["Relation Name"], tuple(missing + [column for column in index_columns if column not in missing]), reason
+
+
+def analyze_plan(plan, tables, indexes, min_rows):
+    """Yield (table, columns, reason) for scans of big tables and sorts which an index could serve better"""
+    for node, parents in walk(plan):
+        if node["Node Type"] == "Sort":
+            yield from analyze_sort(node, parents, tables, min_rows)
+            continue
+        table = tables.get(node.get("Relation Name"))
+        if table is None or table["rows"] < min_rows or not node.get("Filter"):
+            continue
+        if node["Node Type"] in ("Seq Scan", "Index Scan", "Index Only Scan"):
+            index_columns = indexes[node["Relation Name"]].get(node.get("Index Name"), [])
+            yield from analyze_scan(node, table, index_columns)
+
+
+def find_index(table, columns, indexes):
+    for name, index_columns in indexes.get(table, {}).items():
+        if columns and tuple(index_columns[: len(columns)]) == columns:
+            return name
+
+
+def merge_suggestions(suggestions):
+    # an index on (a, b) also serves what (a) would, so fold narrower suggestions into wider ones
+    merged = []
+    for suggestion in sorted(suggestions, key=lambda suggestion: len(suggestion.columns), reverse=True):
+        wider = next(
+            (
+                other
+                for other in merged
+                if suggestion.columns
+                and other.table == suggestion.table
+                and other.columns[: len(suggestion.columns)] == suggestion.columns
+            ),
+            None,
+        )
+        if wider is None:
+            merged.append(suggestion)
+        else:
+            wider.shapes.extend(shape for shape in suggestion.shapes if shape not in wider.shapes)
+    return sorted(merged, key=lambda suggestion: suggestion.duration, reverse=True)
+
+
+async def advise(conn, shapes, analyze=False, min_rows=1000):
+    tables = {row["table"]: {"rows": row["rows"], "columns": set(row["columns"])} for row in await conn.fetch(TABLES_QUERY)}
+    indexes = defaultdict(dict)
+    for row in await conn.fetch(INDEXES_QUERY):
+        indexes[row["table"]][row["index"]] = row["columns"]
+    suggestions = {}
+    for shape in shapes.values():
+        if not shape.query.lstrip().lower().startswith(EXPLAINABLE):
+            continue
+        try:
+            plan = await explain(conn, shape.query, analyze)
+        except (asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+            print(f"Could not explain {shape.query[:100]}: {exc}")
+            continue
+        for table, columns, reason in analyze_plan(plan, tables, indexes, min_rows):
+            suggestion = suggestions.setdefault(
+                (table, columns), Suggestion(table, columns, reason, existing_index=find_index(table, columns, indexes))
+            )
+            suggestion.shapes.append(shape)
+    return merge_suggestions(suggestions.values())
+
+
+def report(suggestions):
+    if not suggestions:
+        print("No missing indexes found")
+        return
+    for suggestion in suggestions:
+        calls = sum(shape.calls for shape in suggestion.shapes)
+        print(f"{suggestion.table}: {suggestion.reason}, {calls} calls, {suggestion.duration * 1000:.1f}ms captured")
+        if suggestion.existing_index:
+            print(f"  {suggestion.existing_index} exists but is not used, check statistics (ANALYZE) and the query")
+        elif suggestion.columns:
+            print(f"  {suggestion.statement}")
+        for shape in suggestion.shapes[:3]:
+            print(f"    {' '.join(shape.query.split())[:200]}")
+
+
+async def run(args):
+    shapes = {}
+    load_log_shapes(args.log, shapes)
+    conn = await asyncpg.connect(Settings().connection_str, server_settings={"plan_cache_mode": "force_generic_plan"})
+    try:
+        if args.pg_stat_statements:
+            await load_pg_stat_statements(conn, shapes, args.pg_stat_statements)
+        print(f"Replaying {len(shapes)} query shapes")
+        report(await advise(conn, shapes, args.analyze, args.min_rows))
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", nargs="*", default=[Settings().slow_request_log], help="slow request logs to replay")
+    parser.add_argument("--pg-stat-statements", type=int, default=50, metavar="N", help="top N statements, 0 to skip")
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE statements without parameters")
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignore tables with fewer estimated rows")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
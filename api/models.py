@@ -1,14 +1,13 @@
 import inspect
 import secrets
 import sys
+from collections import defaultdict
 
-from fastapi import HTTPException
-from fastapi.encoders import jsonable_encoder
 from gino.crud import UpdateRequest
 from gino.declarative import ModelType
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
-from api import schemes
+from api import constants, schemes
 from api.db import db
 
 # shortcuts
@@ -22,6 +21,9 @@ Text = db.Text
 ForeignKey = db.ForeignKey
 JSON = db.JSON
 UniqueConstraint = db.UniqueConstraint
+Index = db.Index
+
+METADATA_INDEX_OPS = {"metadata": "jsonb_path_ops"}  # GIN indexes serving meta.key:value containment filters
 
 
 async def create_relations(model_id, related_ids, key_info):
@@ -29,7 +31,12 @@ async def create_relations(model_id, related_ids, key_info):
 
     if key_info.get("one_to_many"):
         data = [
-            {key_info["current_id"]: model_id, "id": utils.common.unique_id(), "created": utils.time.now(), **related_id}
+            {
+                key_info["current_id"]: model_id,
+                "id": key_info["table"].generate_id(),
+                "created": utils.time.now(),
+                **related_id,
+            }
             for related_id in related_ids
         ]
     else:
@@ -42,6 +49,10 @@ async def delete_relations(model_id, key_info):
     await key_info["table"].delete.where(getattr(key_info["table"], key_info["current_id"]) == model_id).gino.status()
 
 
+async def delete_relations_many(model_ids, key_info):
+    await key_info["table"].delete.where(getattr(key_info["table"], key_info["current_id"]).in_(model_ids)).gino.status()
+
+
 class BaseModelMeta(ModelType):
     def __new__(cls, name, bases, attrs):
         new_class = type.__new__(cls, name, bases, attrs)
@@ -50,7 +61,7 @@ class BaseModelMeta(ModelType):
             if hasattr(new_class, "TABLE_PREFIX"):  # pragma: no cover
                 new_class.__namespace__["__tablename__"] = f"plugin_{new_class.TABLE_PREFIX}_{new_class.__tablename__}"
             if getattr(new_class, "METADATA", True):
-                new_class.__namespace__["metadata"] = Column(JSON)
+                new_class.__namespace__["metadata"] = Column(JSONB)
         if new_class.__table__ is None:
             new_class.__table__ = getattr(new_class, "_init_table")(new_class)
         return new_class
@@ -59,12 +70,21 @@ class BaseModelMeta(ModelType):
 class BaseModel(db.Model, metaclass=BaseModelMeta):
     JSON_KEYS: dict = {}
     FKEY_MAPPING: dict = {}
+    SORTABLE_ID = False  # time-ordered IDs, for tables with many inserts
+    # columns matched by the free text of list queries, and key:value filters with their allowed operators
+    # (eq, in, range, prefix, ilike, contains), only declare those an index on the column can serve
+    SEARCH_FIELDS: tuple = ()
+    FILTER_FIELDS: dict = {}
+
+    @classmethod
+    def get_m2m_keys(cls):
+        model_variant = getattr(cls, "KEYS", {})
+        update_variant = getattr(cls._update_request_cls, "KEYS", {})
+        return model_variant or update_variant
 
     @property
     def M2M_KEYS(self):
-        model_variant = getattr(self, "KEYS", {})
-        update_variant = getattr(self._update_request_cls, "KEYS", {})
-        return model_variant or update_variant
+        return self.get_m2m_keys()
 
     async def create_related(self):
         for key in self.M2M_KEYS:
@@ -90,10 +110,36 @@ class BaseModel(db.Model, metaclass=BaseModelMeta):
                 )
                 setattr(self, key, [obj_id for obj_id, in result if obj_id])
 
+    @classmethod
+    async def add_related_many(cls, items):
+        """add_related for many objects, with one query per relation instead of one per object"""
+        ids = [item.id for item in items]
+        for key, key_info in cls.get_m2m_keys().items():
+            table = key_info["table"]
+            current_id = getattr(table, key_info["current_id"])
+            grouped = defaultdict(list)
+            if key_info.get("one_to_many"):
+                for obj in await table.query.where(current_id.in_(ids)).gino.all():
+                    grouped[getattr(obj, key_info["current_id"])].append(obj)
+            else:
+                result = (
+                    await table.select(key_info["current_id"], key_info["related_id"]).where(current_id.in_(ids)).gino.all()
+                )
+                for model_id, obj_id in result:
+                    if obj_id:
+                        grouped[model_id].append(obj_id)
+            for item in items:
+                setattr(item, key, grouped[item.id])
+
     async def delete_related(self):
         for key_info in self.M2M_KEYS.values():
             await delete_relations(self.id, key_info)
 
+    @classmethod
+    async def delete_related_many(cls, model_ids):
+        for key_info in cls.get_m2m_keys().values():
+            await delete_relations_many(model_ids, key_info)
+
     async def add_fields(self):
         for field, scheme in self.JSON_KEYS.items():
             setattr(self, field, self.get_json_key(field, scheme))
@@ -102,6 +148,12 @@ class BaseModel(db.Model, metaclass=BaseModelMeta):
         await self.add_related()
         await self.add_fields()
 
+    @classmethod
+    async def load_data_many(cls, items):
+        await cls.add_related_many(items)
+        for item in items:
+            await item.add_fields()
+
     async def _delete(self, *args, **kwargs):
         await self.delete_related()
         return await super()._delete(*args, **kwargs)
@@ -114,6 +166,8 @@ class BaseModel(db.Model, metaclass=BaseModelMeta):
         return model
 
     async def validate(self, kwargs, user=None):
+        from fastapi import HTTPException
+
         from api import utils
 
         fkey_columns = (col for col in self.__table__.columns if col.foreign_keys)
@@ -158,10 +212,14 @@ class BaseModel(db.Model, metaclass=BaseModelMeta):
         return kwargs
 
     @classmethod
-    def prepare_create(cls, kwargs):
+    def generate_id(cls):
         from api import utils
 
-        kwargs["id"] = utils.common.unique_id()
+        return utils.common.sortable_id() if cls.SORTABLE_ID else utils.common.unique_id()
+
+    @classmethod
+    def prepare_create(cls, kwargs):
+        kwargs["id"] = cls.generate_id()
         if "metadata" not in kwargs and getattr(cls, "METADATA", True):  # pragma: no cover
             kwargs["metadata"] = {}
         return kwargs
@@ -175,10 +233,21 @@ class BaseModel(db.Model, metaclass=BaseModelMeta):
         return scheme(**data)
 
     async def set_json_key(self, key, scheme):
-        # Update only passed values, don't modify existing ones
-        json_data = jsonable_encoder(getattr(self, key).model_copy(update=scheme.model_dump(exclude_unset=True)))
-        kwargs = {key: json_data}
-        await self.update(**kwargs).apply()
+        # Update only passed values, don't modify existing ones: merged in one statement without reading the document
+        # first, so that concurrent updates of different values aren't lost
+        column = getattr(self.__class__, key)
+        json_data = scheme.model_dump(mode="json", exclude_unset=True)
+        # a missing document may be stored as SQL NULL or as JSON null
+        empty, null = db.literal_column("'{}'::jsonb"), db.literal_column("'null'::jsonb")
+        current = db.func.coalesce(db.func.nullif(column, null), empty)
+        merged = current.op("||")(db.bindparam(key, json_data, type_=JSONB))
+        value = (
+            await self.__class__.update.values(**{key: merged})
+            .where(self.__class__.id == self.id)
+            .returning(column)
+            .gino.scalar()
+        )
+        setattr(self, key, self.JSON_KEYS[key](**(value or {})))
 
 
 # Abstract class to easily implement many-to-many update behaviour
@@ -216,13 +285,20 @@ class User(BaseModel):
     __tablename__ = "users"
 
     JSON_KEYS = {"settings": schemes.UserPreferences}
+    SORTABLE_ID = True
+    SEARCH_FIELDS = ("email",)
+    FILTER_FIELDS = {"email": ("eq", "in", "prefix"), "created": ("range",)}
 
     id = Column(Text, primary_key=True, index=True)
     email = Column(Text, unique=True, index=True)
     hashed_password = Column(Text)
     permissions = Column(ARRAY(Text))
     created = Column(DateTime(True), nullable=False)
-    settings = Column(JSON)
+    settings = Column(JSONB)
+
+    _created_idx = Index("users_created_id_idx", "created", "id")  # default pagination order
+    _email_pattern_idx = Index("users_email_pattern_idx", "email", postgresql_ops={"email": "text_pattern_ops"})
+    _metadata_idx = Index("users_metadata_idx", "metadata", postgresql_using="gin", postgresql_ops=METADATA_INDEX_OPS)
 
     @classmethod
     def process_kwargs(cls, kwargs):
@@ -239,6 +315,17 @@ class User(BaseModel):
 class Question(BaseModel):
     __tablename__ = "questions"
 
+    SORTABLE_ID = True
+    SEARCH_FIELDS = ("name", "question", "topic", "company")
+    FILTER_FIELDS = {
+        "topic": ("eq", "in"),
+        "company": ("eq", "in"),
+        "difficulty": ("eq", "in"),
+        "name": ("eq", "prefix"),
+        "solutions": ("contains",),
+        "created": ("range",),
+    }
+
     id = Column(Text, primary_key=True, index=True)
     name = Column(Text)
     question = Column(Text)
@@ -249,9 +336,58 @@ class Question(BaseModel):
     company = Column(Text)
     hints = Column(ARRAY(Text))
     solutions = Column(ARRAY(Text))
-    comments = Column(JSON)
+    comment_count = Column(Integer, nullable=False, server_default="0")
+    created = Column(DateTime(True), nullable=False)
+
+    _created_idx = Index("questions_created_id_idx", "created", "id")  # default pagination order
+    _topic_idx = Index("questions_topic_created_id_idx", "topic", "created", "id")
+    _company_idx = Index("questions_company_created_id_idx", "company", "created", "id")
+    _difficulty_idx = Index("questions_difficulty_created_id_idx", "difficulty", "created", "id")
+    _name_pattern_idx = Index("questions_name_pattern_idx", "name", postgresql_ops={"name": "text_pattern_ops"})
+    _solutions_idx = Index("questions_solutions_idx", "solutions", postgresql_using="gin")
+    _metadata_idx = Index("questions_metadata_idx", "metadata", postgresql_using="gin", postgresql_ops=METADATA_INDEX_OPS)
+
+    # Checks the answer and records the solve in one round trip, without loading the row.
+    # The solved check is repeated in the UPDATE so that it is re-evaluated against concurrent solves.
+    SOLVE_QUERY = db.text("""
+        WITH question AS (
+            SELECT id, answer = :answer AS correct, coalesce(cardinality(solutions), 0) AS solution_count
+            FROM questions WHERE id = :id
+        ), solve AS (
+            UPDATE questions SET solutions = array_append(coalesce(questions.solutions, '{}'), :email)
+            FROM question
+            WHERE questions.id = question.id AND question.correct
+                AND NOT :email = ANY(coalesce(questions.solutions, '{}'))
+            -- the live feed event, sent on commit and only by the request which added the solution
+            RETURNING cardinality(questions.solutions) AS solution_count, pg_notify(:channel, json_build_object(
+                'event', 'solve',
+                'data', json_build_object('question_id', questions.id, 'solution_count', cardinality(questions.solutions)),
+                'sent', extract(epoch FROM clock_timestamp())
+            )::text)
+        )
+        SELECT id, correct, coalesce((SELECT solution_count FROM solve), solution_count) AS solution_count FROM question
+        """)
+
+    @classmethod
+    async def solve(cls, question_id, answer, email):
+        """Returns None if the question doesn't exist, or a (correct, solution_count) row"""
+        return await db.first(cls.SOLVE_QUERY, id=question_id, answer=answer, email=email, channel=constants.FEED_CHANNEL)
+
+
+class Comment(BaseModel):
+    __tablename__ = "comments"
+
+    METADATA = False
+    SORTABLE_ID = True
+
+    id = Column(Text, primary_key=True, index=True)
+    question_id = Column(Text, ForeignKey(Question.id, ondelete="CASCADE"), nullable=False)
+    email = Column(Text)
+    message = Column(Text)
     created = Column(DateTime(True), nullable=False)
 
+    _question_idx = Index("comments_question_id_created_id_idx", "question_id", "created", "id")  # keyset pagination
+
 
 class Setting(BaseModel):
     __tablename__ = "settings"
@@ -280,6 +416,8 @@ class Token(BaseModel):
     scopes = Column(ARRAY(Text))
     created = Column(DateTime(True), nullable=False)
 
+    _created_idx = Index("tokens_created_idx", "created", postgresql_using="brin")
+
     @classmethod
     def prepare_create(cls, kwargs):
         kwargs = super().prepare_create(kwargs)
@@ -1,22 +1,36 @@
-import asyncio
 from collections.abc import Callable
+from functools import cache
 
 import asyncpg
-from fastapi import Query
-from sqlalchemy import Text, and_, or_, text
+from fastapi import HTTPException, Query
+from gino.loader import ColumnLoader
+from sqlalchemy import Text, and_, or_
 from starlette.requests import Request
 
-from api import utils
+from api import constants, utils
 from api.db import db
 
 
 def get_all_columns_filter(model, text):
+    if not model.SEARCH_FIELDS:
+        raise HTTPException(422, f"Text search is not supported for {model.__name__}")
     return [
-        getattr(model, m.key).cast(Text).op("~*")(text)  # NOTE: not cross-db, postgres case-insensitive regex
-        for m in model.__table__.columns
+        getattr(model, field).cast(Text).op("~*")(text)  # NOTE: not cross-db, postgres case-insensitive regex
+        for field in model.SEARCH_FIELDS
     ]
 
 
+@cache
+def get_index_ordered_columns(table) -> frozenset[str]:
+    """Columns which lead a plain btree index of the table, so ORDER BY on them can be read off the index"""
+    columns = {column.name for column in table.primary_key}
+    for index in table.indexes:
+        options = index.dialect_options["postgresql"]
+        if options["using"] in (False, None, "btree") and not options["ops"]:  # i.e. not gin or text_pattern_ops
+            columns.add(index.expressions[0].name)
+    return frozenset(columns)
+
+
 class Pagination:
     default_offset = 0
     default_limit = 5
@@ -32,6 +46,7 @@ class Pagination:
         multiple: bool = Query(default=False),
         sort: str = Query(default=""),
         desc: bool = Query(default=True),
+        fields: str = Query(default="", description=constants.FIELDS_DESCRIPTION),
     ):
         self.request = request
         self.offset = offset
@@ -42,7 +57,7 @@ class Pagination:
             self.query.text = self.query.text.replace(",", "|")
         self.sort = sort
         self.desc = desc
-        self.desc_s = "desc" if desc else ""
+        self.fields = utils.common.parse_fields(fields)
         self.model = None
 
     def get_previous_url(self) -> str | None:
@@ -59,35 +74,88 @@ class Pagination:
 
     async def get_count(self, query) -> int:
         try:
-            return await utils.database.get_scalar(query, db.func.count, self.model.id)
+            # distinct is only needed when a join could repeat rows, otherwise it just adds a sort of every id
+            return await utils.database.get_scalar(query, db.func.count, self.model.id, self.needs_group_by(query))
         except asyncpg.exceptions.DataError:
             return 0
 
-    async def get_list(self, query) -> list:
-        if not self.sort:
-            self.sort = "created"
-            self.desc_s = "desc"
-        query = query.group_by(self.model.id)
+    def get_sort(self) -> tuple[str, bool]:
+        if self.sort:
+            return self.sort, self.desc
+        return "created" if "created" in self.model.__table__.columns else "id", True
+
+    def get_order_by(self) -> list:
+        columns = self.model.__table__.columns
+        sort, desc = self.get_sort()
+        if sort not in columns:
+            raise HTTPException(422, f"Invalid sort field: {sort}")
+        order = [columns[sort]] if sort == "id" else [columns[sort], columns["id"]]  # id keeps pages stable on ties
+        return [column.desc() if desc else column.asc() for column in order]
+
+    def needs_group_by(self, query) -> bool:
+        # only joins can duplicate rows, grouping otherwise just stops indexes from serving ORDER BY ... LIMIT
+        return any(table is not self.model.__table__ for table in query.froms)
+
+    def is_index_ordered(self, query) -> bool:
+        """Whether an index can serve the page's order, so that the scan stops after limit + offset rows.
+
+        Text search is a regex over every searchable column, and a join is grouped by id, so postgres reads every
+        matching row for those however the page is sorted, as it does when no btree index leads with the sort column.
+        """
+        if self.query.text or self.needs_group_by(query):
+            return False
+        return self.get_sort()[0] in get_index_ordered_columns(self.model.__table__)
+
+    def get_page_query(self, query):
+        """The page query, with the total count as its last column if it isn't ordered by an index.
+
+        count(*) OVER () puts a WindowAgg above the scan which reads the whole result: free when all matching rows are
+        read anyway, as it saves the separate count query then, but it would stop an index scan from stopping at LIMIT.
+        """
+        order_by = self.get_order_by()
+        index_ordered = self.is_index_ordered(query)
+        if self.needs_group_by(query):
+            query = query.group_by(self.model.id)
+        loader = self.model
+        if self.fields:
+            query = utils.database.select_fields(self.model, query, self.fields)
+            loader = query.get_execution_options()["loader"]
+        if not index_ordered:
+            total = db.func.count().over().label("total_count")  # computed after any GROUP BY, so it counts distinct rows
+            query = query.column(total).execution_options(loader=(loader, ColumnLoader(total)))
         if self.limit != -1:
             query = query.limit(self.limit)
-        query = query.order_by(text(f"{self.sort} {self.desc_s}"))
+        return query.order_by(*order_by).offset(self.offset)
+
+    async def get_list(self, query) -> tuple[list, int | None]:
+        """Returns the page and the total count if the page query or the page itself shows it, None otherwise"""
+        page_query = self.get_page_query(query)
         try:
-            return await query.offset(self.offset).gino.all()
-        except (asyncpg.exceptions.UndefinedColumnError, asyncpg.exceptions.DataError):
-            return []
+            rows = await page_query.gino.all()
+        except asyncpg.exceptions.DataError:  # i.e. an invalid regex in the search text
+            return [], None
+        if isinstance(page_query.get_execution_options().get("loader"), tuple):  # with the window count
+            return [item for item, _ in rows], rows[0][1] if rows else self.get_page_count(rows)
+        return rows, self.get_page_count(rows)
+
+    def get_page_count(self, data) -> int | None:
+        """The total count when the page itself shows it, None if it has to be counted"""
+        if data and (self.limit == -1 or len(data) < self.limit):  # the last page
+            return self.offset + len(data)
+        if not data and not self.offset and self.limit:  # no matches, limit=0 pages are always empty
+            return 0
+        return None  # a full page or past the end
 
     def search(self):
         if not self.query:
             return []
         queries = []
         queries.extend(self.query.get_created_filter(self.model))
-        for search_filter, value in self.query.filters.items():
-            column = getattr(self.model, search_filter, None)
-            if column is not None:
-                queries.append(column.in_(value))
-        full_filters = get_all_columns_filter(self.model, self.query.text)
-        queries.append(or_(*full_filters))
-        return and_(*queries)
+        queries.extend(self.query.get_metadata_filter(self.model))
+        queries.extend(self.query.get_field_filter(self.model))
+        if self.query.text:  # an empty regex matches everything, but would still be evaluated on every column
+            queries.append(or_(*get_all_columns_filter(self.model, self.query.text)))
+        return and_(*queries) if queries else []
 
     async def paginate(
         self,
@@ -98,12 +166,16 @@ class Pagination:
         *args,
         **kwargs,
     ) -> dict | int:
-        query = await self.get_queryset(model, user, *args, **kwargs)
-        if count_only:
-            return await self.get_count(query)
-        count, data = await asyncio.gather(self.get_count(query), self.get_list(query))
-        if postprocess:
-            data = await postprocess(data)
+        # one connection for the whole request instead of one per concurrent query
+        async with db.acquire(reuse=True):
+            query = await self.get_queryset(model, user, *args, **kwargs)
+            if count_only:
+                return await self.get_count(query)
+            data, count = await self.get_list(query)
+            if count is None:  # a full index ordered page, past the end or limit=0
+                count = await self.get_count(query)
+            if postprocess:
+                data = await postprocess(data)
         return {
             "count": count,
             "next": self.get_next_url(count),
@@ -1,10 +1,12 @@
 from datetime import datetime
 from decimal import Decimal
+from functools import cache
 from typing import Annotated, Any, ClassVar
 
 from pydantic import BaseModel as PydanticBaseModel
 from pydantic import ConfigDict, EmailStr, Field, PlainSerializer, field_validator, model_validator
 
+from api import constants
 from api.types import StrEnum
 
 DecimalAsFloat = Annotated[Decimal, PlainSerializer(lambda v: float(v), return_type=float, when_used="json")]
@@ -26,6 +28,12 @@ def iter_attributes(obj):  # to do the from_attributes job because pydantic does
                 yield k, v
 
 
+@cache
+def get_schema_properties(model) -> frozenset[str]:
+    # building the json schema is expensive, so visible fields are computed once per model class
+    return frozenset(model.model_json_schema()["properties"])
+
+
 class BaseModel(PydanticBaseModel):
     MODE: ClassVar[str] = WorkingMode.UNSET
 
@@ -42,7 +50,8 @@ class BaseModel(PydanticBaseModel):
             values = {k: v for k, v in values.items() if v != ""}
         else:
             # We also skip empty strings (to trigger defaults) as that's what frontend sends
-            values = {k: v for k, v in values.items() if k in cls.model_json_schema()["properties"] and v != ""}
+            properties = get_schema_properties(cls)
+            values = {k: v for k, v in values.items() if k in properties and v != ""}
         return handler(values)
 
     @staticmethod
@@ -132,7 +141,7 @@ class CreateQuestion(CreateModel, CreatedMixin):
     company: str
     hints: list[str]
     solutions: list = Field([], json_schema_extra={"hidden": True})
-    comments: list = Field([], json_schema_extra={"hidden": True})
+    comment_count: int = Field(0, json_schema_extra={"hidden": True})
 
 
 class UpdateQuestion(UpdateModel, CreateQuestion):
@@ -143,6 +152,28 @@ class DisplayQuestion(DisplayModel, UpdateQuestion):
     id: str
 
 
+class DisplaySolve(DisplayModel):
+    id: str
+    solution_count: int
+
+
+class DisplayCommentCount(DisplayModel):
+    id: str
+    comment_count: int
+
+
+class DisplayComment(DisplayModel):
+    id: str
+    email: str
+    message: str
+    created: datetime
+
+
+class CommentPage(DisplayModel):
+    next: str | None = None
+    result: list[DisplayComment]
+
+
 # Tokens
 class HTTPCreateToken(CreatedMixin):
     scopes: list[str] = []
@@ -177,6 +208,16 @@ class BatchSettings(DisplayModel):
     options: dict | None = {}
 
 
+class GetManySettings(DisplayModel):
+    ids: list[str] = Field(max_length=constants.GET_MANY_MAX_IDS)
+
+
+class BatchResult(DisplayModel):
+    command: str
+    affected: int
+
+
 class EventSystemMessage(DisplayModel):
     event: str
     data: dict
+    sent: float | None = None  # unix timestamp, to measure event bus lag
@@ -1,6 +1,7 @@
 import asyncio
 from contextlib import asynccontextmanager
 from contextvars import ContextVar
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -16,6 +17,25 @@ class Settings(BaseSettings):
     db_port: int = Field(5432, validation_alias="DB_PORT")
     openapi_path: str | None = Field(None, validation_alias="OPENAPI_PATH")
     api_title: str = Field("Interview prepare", validation_alias="API_TITLE")
+    compression_minimum_size: int = Field(500, validation_alias="COMPRESSION_MINIMUM_SIZE")
+    compression_gzip_level: int = Field(6, validation_alias="COMPRESSION_GZIP_LEVEL")
+    compression_brotli_quality: int = Field(4, validation_alias="COMPRESSION_BROTLI_QUALITY")
+    workers: int | None = Field(None, validation_alias="WORKERS")  # gunicorn workers, cpu_count * 2 + 1 by default
+    preload_app: bool = Field(True, validation_alias="PRELOAD_APP")
+    metrics_enabled: bool = Field(True, validation_alias="METRICS_ENABLED")
+    profiling_enabled: bool = Field(False, validation_alias="PROFILING_ENABLED")
+    slow_request_threshold: float = Field(0.5, validation_alias="SLOW_REQUEST_THRESHOLD")  # seconds
+    slow_request_log: str | None = Field("slow_requests.log", validation_alias="SLOW_REQUEST_LOG")
+    slow_request_log_max_bytes: int = Field(10 * 1024 * 1024, validation_alias="SLOW_REQUEST_LOG_MAX_BYTES")
+    slow_request_log_backups: int = Field(5, validation_alias="SLOW_REQUEST_LOG_BACKUPS")
+    n_plus_one_threshold: int = Field(5, validation_alias="N_PLUS_ONE_THRESHOLD")
+    comment_write_mode: Literal["sync", "buffered"] = Field("sync", validation_alias="COMMENT_WRITE_MODE")
+    comment_flush_interval: float = Field(0.2, validation_alias="COMMENT_FLUSH_INTERVAL")  # seconds
+    comment_buffer_max_size: int = Field(10000, validation_alias="COMMENT_BUFFER_MAX_SIZE")  # pending comments per worker
+    batch_chunk_size: int = Field(1000, validation_alias="BATCH_CHUNK_SIZE")  # ids per statement of batch actions
+    feed_queue_size: int = Field(100, validation_alias="FEED_QUEUE_SIZE")  # pending events per live feed connection
+    feed_heartbeat_interval: float = Field(15, validation_alias="FEED_HEARTBEAT_INTERVAL")  # seconds
+    settings_refresh_interval: float = Field(60, validation_alias="SETTINGS_REFRESH_INTERVAL")  # seconds, see utils.policies
 
     model_config = SettingsConfigDict(env_file="conf/.env", extra="ignore")
 
@@ -23,8 +43,16 @@ class Settings(BaseSettings):
     def connection_str(self):
         return f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
 
+    def get_db_pool_kwargs(self):
+        from api import utils
+
+        kwargs = {"min_size": 1}
+        if self.metrics_enabled or self.profiling_enabled:
+            kwargs["connection_class"] = utils.metrics.InstrumentedConnection
+        return kwargs
+
     async def create_db_engine(self):
-        return await db.db.set_bind(self.connection_str, min_size=1, loop=asyncio.get_running_loop())
+        return await db.db.set_bind(self.connection_str, loop=asyncio.get_running_loop(), **self.get_db_pool_kwargs())
 
     async def shutdown_db_engine(self):
         await db.db.pop_bind().close()
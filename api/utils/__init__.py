@@ -1,12 +1,33 @@
-from api.utils import authorization, common, database, policies, redis, routing, schemes, time
+from api.utils import (
+    authorization,
+    comments,
+    common,
+    compression,
+    database,
+    feed,
+    metrics,
+    policies,
+    profiling,
+    redis,
+    routing,
+    schemes,
+    serialization,
+    time,
+)
 
 __all__ = [
     "authorization",
+    "comments",
     "common",
+    "compression",
     "database",
+    "feed",
+    "metrics",
     "policies",
+    "profiling",
     "redis",
     "routing",
     "schemes",
+    "serialization",
     "time",
 ]
@@ -1,21 +1,28 @@
+from functools import cache, lru_cache
+
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
-from pwdlib import PasswordHash
-from pwdlib.hashers.bcrypt import BcryptHasher
 from starlette.requests import Request
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
-from api import models, utils
+from api import constants, models, utils
+
 
-pwd_context = PasswordHash((BcryptHasher(),))
+@cache
+def get_pwd_context():
+    # bcrypt is only needed on login and signup, so don't pay for importing it on startup
+    from pwdlib import PasswordHash
+    from pwdlib.hashers.bcrypt import BcryptHasher
+
+    return PasswordHash((BcryptHasher(),))
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 async def authenticate_user(email: str, password: str):
@@ -45,30 +52,91 @@ To authorize, send an `Authorization` header with value of `Bearer <token>` (rep
 optional_bearer_description = "Same as Bearer, but not required. Logic for unauthorized users depends on current endpoint"
 
 
-def get_authenticate_value(scopes):
+@lru_cache(maxsize=1024)
+def _get_authenticate_value(scopes: tuple[str, ...]):
     return f'Bearer scope="{" ".join(scopes)}"' if scopes else "Bearer"
 
 
-def check_permissions(user, token, scopes):
-    authenticate_value = get_authenticate_value(scopes)
-    available_permissions = set(user.permissions)
-    actual_scopes = set(token.scopes) if token else set(scopes)
-    if "full_control" in actual_scopes:
+def get_authenticate_value(scopes):
+    return _get_authenticate_value(tuple(scopes))
+
+
+# Scopes are interned to bits, so that permission checks become integer operations. Only scopes of user permissions
+# are interned, as those are set by admins: requested and token scopes are client input, and a scope which no user holds
+# can't be granted anyway, so those map to a bit which no permission set has.
+UNKNOWN_SCOPE = 1
+SCOPE_BITS: dict[str, int] = {scope: UNKNOWN_SCOPE << (i + 1) for i, scope in enumerate(constants.SCOPES)}
+
+
+def get_scope_bit(scope: str) -> int:
+    return SCOPE_BITS.get(scope, UNKNOWN_SCOPE)
+
+
+def intern_scope(scope: str) -> int:
+    bit = SCOPE_BITS.get(scope)
+    if bit is None:
+        bit = SCOPE_BITS[scope] = UNKNOWN_SCOPE << (len(SCOPE_BITS) + 1)
+        # cached masks may have mapped this scope to UNKNOWN_SCOPE before
+        get_scopes_mask.cache_clear()
+        _has_permissions.cache_clear()
+    return bit
+
+
+@lru_cache(maxsize=4096)
+def get_scopes_mask(scopes: tuple[str, ...]) -> int:
+    mask = 0
+    for scope in scopes:
+        mask |= get_scope_bit(scope)
+    return mask
+
+
+def get_permissions_mask(permissions: tuple[str, ...]) -> int:
+    mask = 0
+    for scope in permissions:
+        mask |= intern_scope(scope)
+    return mask
+
+
+FULL_CONTROL = get_scope_bit("full_control")
+ADMIN_ACCESS = get_scope_bit("admin_access")
+
+
+@lru_cache(maxsize=4096)
+def _has_permissions(permissions: tuple[str, ...], token_scopes: tuple[str, ...] | None, scopes: tuple[str, ...]) -> bool:
+    available_permissions = get_permissions_mask(permissions)  # first, so that the other masks see its scopes
+    actual_scopes = get_scopes_mask(token_scopes if token_scopes is not None else scopes)
+    if actual_scopes & FULL_CONTROL:
         actual_scopes = available_permissions
     else:
         actual_scopes &= available_permissions
-    if "admin_access" in actual_scopes:
-        return
-    forbidden_exception = HTTPException(
-        status_code=HTTP_403_FORBIDDEN,
-        detail="Not enough permissions",
-        headers={"WWW-Authenticate": authenticate_value},
+    if actual_scopes & ADMIN_ACCESS:
+        return True
+    required_scopes = get_scopes_mask(scopes) & ~FULL_CONTROL
+    return required_scopes & ~actual_scopes == 0
+
+
+@lru_cache(maxsize=1024)
+def _get_authenticate_headers(scopes: tuple[str, ...]):
+    return {"WWW-Authenticate": _get_authenticate_value(scopes)}
+
+
+def check_permissions(user, token, scopes):
+    scopes = tuple(scopes)
+    token_scopes = tuple(token.scopes or ()) if token else None
+    if not _has_permissions(tuple(user.permissions or ()), token_scopes, scopes):
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+            headers=_get_authenticate_headers(scopes),
+        )
+
+
+def get_credentials_exception(scopes):
+    return HTTPException(
+        status_code=HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers=_get_authenticate_headers(tuple(scopes)),
     )
-    for scope in scopes:
-        if scope == "full_control":
-            continue
-        if scope not in actual_scopes:
-            raise forbidden_exception
 
 
 class AuthDependency(OAuth2PasswordBearer):
@@ -88,15 +156,9 @@ class AuthDependency(OAuth2PasswordBearer):
             if self.return_token:  # pragma: no cover
                 return None, None
             return None
-        authenticate_value = get_authenticate_value(security_scopes.scopes)
         token: str = self.token if self.token else await super().__call__(request)
-        exc = HTTPException(
-            status_code=HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": authenticate_value},
-        )
         if not token:
-            raise exc
+            raise get_credentials_exception(security_scopes.scopes)
         data = (
             await models.User.join(models.Token)
             .select(models.Token.id == token)
@@ -104,7 +166,7 @@ class AuthDependency(OAuth2PasswordBearer):
             .first()
         )
         if data is None:
-            raise exc
+            raise get_credentials_exception(security_scopes.scopes)
         user, token = data  # first validate data, then unpack
         check_permissions(user, token, security_scopes.scopes)
         await user.load_data()
@@ -114,7 +176,8 @@ class AuthDependency(OAuth2PasswordBearer):
 
     async def __call__(self, request: Request, security_scopes: SecurityScopes):
         try:
-            return await self._process_request(request, security_scopes)
+            with utils.metrics.timer(utils.metrics.AUTH_DURATION):
+                return await self._process_request(request, security_scopes)
         except HTTPException:
             if self.auto_error:
                 raise
@@ -0,0 +1,104 @@
+"""Question comments: batched inserts, optionally buffered per worker (COMMENT_WRITE_MODE=buffered).
+
+Buffered comments are acknowledged before they are written. They are flushed on graceful shutdown, but lost if the
+worker crashes, so the default sync mode writes them before responding. Either way, live feed comment events are only
+sent once the comments are committed.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import suppress
+
+import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+
+from api.db import db
+
+logger = logging.getLogger(__name__)
+
+
+async def append_comments(question_id, comments):
+    """Inserts the comments and returns the new comment count of the question"""
+    from api import models, utils
+
+    rows = [{"id": models.Comment.generate_id(), "question_id": question_id, **comment} for comment in comments]
+    async with db.transaction():
+        await models.Comment.insert().values(rows).gino.status()
+        comment_count = (
+            await models.Question.update.values(comment_count=models.Question.comment_count + len(rows))
+            .where(models.Question.id == question_id)
+            .returning(models.Question.comment_count)
+            .gino.scalar()
+        )
+        # NOTIFY is delivered on commit, so subscribers never see comments which weren't written
+        for count, comment in enumerate(comments, comment_count - len(rows) + 1):
+            await utils.feed.publish(question_id, "comment", {"comment": comment, "comment_count": count})
+    return comment_count
+
+
+async def get_comments(question_id, after=None, limit=20):
+    """Keyset pagination in (created, id) order, ``after`` being the id of the last comment of the previous page"""
+    from api import models
+
+    query = models.Comment.query.where(models.Comment.question_id == question_id)
+    if after:
+        anchor = select([models.Comment.created, models.Comment.id]).where(models.Comment.id == after)
+        query = query.where(tuple_(models.Comment.created, models.Comment.id) > anchor.as_scalar())
+    query = query.order_by(models.Comment.created, models.Comment.id).limit(limit + 1)
+    comments = await query.gino.all()
+    return comments[:limit], len(comments) > limit
+
+
+class CommentBuffer:
+    def __init__(self, flush_interval=0.2, max_size=10000):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.pending = defaultdict(list)
+        self.size = 0
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def get_pending(self, question_id):
+        return self.pending.get(question_id, [])
+
+    async def add(self, question_id, comment):
+        if self.size >= self.max_size:
+            await self.flush()  # apply backpressure instead of growing without bound
+            if self.size >= self.max_size:
+                raise HTTPException(503, "Too many pending comments, try again later")
+        self.pending[question_id].append(comment)
+        self.size += 1
+
+    async def flush(self):
+        async with self.lock:
+            pending, self.pending, self.size = self.pending, defaultdict(list), 0
+            for question_id, comments in pending.items():
+                try:
+                    await append_comments(question_id, comments)
+                except asyncpg.ForeignKeyViolationError:
+                    logger.warning("Dropped %d comments of deleted question %s", len(comments), question_id)
+                except Exception:
+                    logger.exception("Failed to flush %d comments of question %s", len(comments), question_id)
+                    # keep them ahead of the ones added meanwhile for the next flush
+                    self.pending[question_id][:0] = comments
+                    self.size += len(comments)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.size:
+                # a flush in progress must not be interrupted by stop(), or the swapped out comments are lost
+                await asyncio.shield(self.flush())
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        await self.flush()
@@ -1,19 +1,24 @@
 import asyncio
+import base64
 import inspect
 import json
+import math
+import operator
+import os
 import secrets
+import time
 import traceback
 from collections import defaultdict
-from datetime import timedelta
+from contextlib import suppress
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from anyio import Semaphore
-from dateutil.parser import isoparse
 from fastapi import HTTPException
 from starlette.concurrency import run_in_threadpool
 
 from api import utils
-from api.constants import ALPHABET, ID_LENGTH, STR_TO_BOOL_MAPPING
+from api.constants import ALPHABET, ID_LENGTH, SORTABLE_ID_ALPHABET, SORTABLE_ID_LENGTH, STR_TO_BOOL_MAPPING
 
 
 def get_object_name(obj):
@@ -24,6 +29,15 @@ def unique_id(length=ID_LENGTH):
     return "".join(secrets.choice(ALPHABET) for _ in range(length))
 
 
+SORTABLE_ID_TRANSLATION = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", SORTABLE_ID_ALPHABET)
+
+
+def sortable_id():
+    # IDs created later sort after earlier ones, so inserts append to the right edge of btree indexes
+    data = (time.time_ns() // 1_000_000).to_bytes(6, "big") + os.urandom(10)
+    return base64.b32encode(data)[:SORTABLE_ID_LENGTH].decode().translate(SORTABLE_ID_TRANSLATION)
+
+
 async def run_universal(func, *args, **kwargs):
     result = func(*args, **kwargs)
     if inspect.isawaitable(result):  # pragma: no cover
@@ -69,19 +83,33 @@ def is_int(v):
         return False
 
 
+# key:>=value and the like, see SearchQuery.parse_filter for the other operators
+RANGE_OPERATORS = {">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt}
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 class SearchQuery:
     DATE_FORMATS = {"h": "hours", "d": "days", "w": "weeks", "m": 30, "y": 30 * 12}
 
+    METADATA_PREFIX = "meta."
+
     def __init__(self, query):
         self.query = query
         self.text = []
         self.filters = defaultdict(list)
+        self.metadata_filters = defaultdict(list)  # meta.key:value, keys are case-sensitive
         for item in query.split():
             parts = item.split(":")
             is_quoted = item[0] == '"' and item[-1] == '"'
             if len(parts) >= 2 and not is_quoted:
-                key = parts[0].lower()
-                self.filters[key].append(":".join(parts[1:]))
+                key = parts[0]
+                if key.lower().startswith(self.METADATA_PREFIX) and len(key) > len(self.METADATA_PREFIX):
+                    self.metadata_filters[key[len(self.METADATA_PREFIX) :]].append(":".join(parts[1:]))
+                    continue
+                self.filters[key.lower()].append(":".join(parts[1:]))
             else:
                 if is_quoted:
                     item = item[1:-1]
@@ -91,8 +119,10 @@ class SearchQuery:
     def parse_datetime(self, key):
         if key not in self.filters:
             return
+        return self.parse_date(self.filters.pop(key)[0])
+
+    def parse_date(self, date):
         now = utils.time.now()
-        date = self.filters.pop(key)[0]
         if len(date) >= 3 and date[0] == "-" and date[-1] in self.DATE_FORMATS and is_int(date[1:-1]):
             val = int(date[1:-1])
             dt_format = date[-1]
@@ -102,6 +132,8 @@ class SearchQuery:
             else:
                 key = self.DATE_FORMATS[dt_format]
             return now - timedelta(**{key: val})
+        from dateutil.parser import isoparse  # imported lazily, date filters are rare
+
         try:
             return isoparse(date)
         except ValueError:
@@ -110,7 +142,6 @@ class SearchQuery:
     def get_created_filter(self, model, key="created"):
         if getattr(model, key, None) is None:  # pragma: no cover
             return []
-        self.filters.pop(key, None)
         start_date = self.parse_datetime("start_date")
         end_date = self.parse_datetime("end_date")
         queries = []
@@ -120,8 +151,109 @@ class SearchQuery:
             queries.append(model.created <= end_date)
         return queries
 
+    @staticmethod
+    def parse_metadata_value(value):
+        # meta.count:3 matches the number 3, meta.count:"3" the string
+        with suppress(ValueError):
+            parsed = json.loads(value)
+            if isinstance(parsed, float) and not math.isfinite(parsed):  # NaN, Infinity, 1e999 aren't valid in jsonb
+                return value
+            if isinstance(parsed, (str, bool, int, float)) or parsed is None:
+                return parsed
+        return value
+
+    def get_metadata_filter(self, model, key="metadata"):
+        """meta.a.b:x compiles to metadata @> '{"a": {"b": "x"}}', which a GIN index on the column serves"""
+        if not self.metadata_filters:
+            return []
+        column = getattr(model, key, None)
+        if column is None:
+            raise HTTPException(422, f"{model.__name__} has no metadata to filter by")
+        from sqlalchemy import or_
+
+        queries = []
+        for path, values in self.metadata_filters.items():
+            documents = []
+            for value in values:
+                document = self.parse_metadata_value(value)
+                for part in reversed(path.split(".")):
+                    document = {part: document}
+                documents.append(document)
+            queries.append(or_(*[column.contains(document) for document in documents]))
+        return queries
+
+    @staticmethod
+    def parse_filter(column, value):
+        """Split a filter value into its operator and operand, i.e. >=5 -> ("range", ">=", "5")"""
+        from sqlalchemy.dialects.postgresql import ARRAY
+
+        for op in RANGE_OPERATORS:
+            if value.startswith(op):
+                return "range", op, value[len(op) :]
+        if value.startswith("~") and len(value) > 1:
+            return "ilike", None, value[1:]
+        if value.endswith("*") and len(value) > 1:
+            return "prefix", None, value[:-1]
+        if isinstance(column.type, ARRAY):
+            return "contains", None, value
+        if "," in value:
+            return "in", None, value.split(",")
+        return "eq", None, value
+
+    def convert_filter_value(self, key, column, value):
+        from sqlalchemy.dialects.postgresql import ARRAY
+
+        column_type = column.type.item_type if isinstance(column.type, ARRAY) else column.type
+        python_type = column_type.python_type
+        if python_type is datetime:
+            converted = self.parse_date(value)
+            if converted is None:
+                raise HTTPException(422, f"Invalid date in filter {key}: {value}")
+            return converted
+        if python_type is bool:
+            return str_to_bool(value)
+        if python_type in (int, float, Decimal):
+            try:
+                return python_type(value)
+            except (ValueError, ArithmeticError):
+                raise HTTPException(422, f"Invalid number in filter {key}: {value}")
+        return value
+
+    def get_field_filter(self, model):
+        """Compile key:value filters of the fields declared in model.FILTER_FIELDS, other filters are rejected"""
+        from sqlalchemy import or_
+
+        queries = []
+        for key, values in self.filters.items():
+            operators = model.FILTER_FIELDS.get(key)
+            if operators is None:
+                raise HTTPException(422, f"Invalid filter: {key}")
+            column = getattr(model, key)
+            matches = []
+            for value in values:
+                kind, range_op, operand = self.parse_filter(column, value)
+                if kind not in operators:
+                    raise HTTPException(422, f"Filter {key} doesn't support {kind}, only {', '.join(operators)}")
+                if kind == "in":
+                    matches.append(column.in_([self.convert_filter_value(key, column, item) for item in operand]))
+                    continue
+                operand = self.convert_filter_value(key, column, operand)
+                if kind == "range":  # all ranges apply, i.e. count:>=5 count:<10
+                    queries.append(RANGE_OPERATORS[range_op](column, operand))
+                elif kind == "eq":
+                    matches.append(column == operand)
+                elif kind == "prefix":
+                    matches.append(column.like(f"{escape_like(operand)}%"))
+                elif kind == "ilike":
+                    matches.append(column.ilike(f"%{escape_like(operand)}%"))
+                elif kind == "contains":
+                    matches.append(column.contains([operand]))
+            if matches:  # repeated keys match any of the values, i.e. topic:a topic:b
+                queries.append(or_(*matches))
+        return queries
+
     def __bool__(self):
-        return bool(self.text or self.filters)
+        return bool(self.text or self.filters or self.metadata_filters)
 
 
 def str_to_bool(s):
@@ -132,10 +264,14 @@ def str_to_bool(s):
     return False
 
 
+def parse_fields(fields):
+    return tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+
+
 def prepare_query_params(request, custom_params=()):
     params = dict(request.query_params)
     # TODO: make it better, for now must be kept in sync with pagination.py
-    for key in ("model", "offset", "limit", "query", "multiple", "sort", "desc") + custom_params:
+    for key in ("model", "offset", "limit", "query", "multiple", "sort", "desc", "fields") + custom_params:
         params.pop(key, None)
     return params
 
@@ -0,0 +1,190 @@
+import zlib
+from functools import lru_cache, partial
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)  # live feeds must reach the client as soon as they are sent
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)  # in order of preference
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    encodings = {}
+    for item in header.split(","):
+        encoding, _, params = item.partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[encoding] = quality
+    return encodings
+
+
+@lru_cache(maxsize=256)
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted = parse_accept_encoding(accept_encoding)
+    best_encoding, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNCOMPRESSIBLE_TYPES)
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # sync flush so that every streamed chunk can be decoded by the client right away
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+def get_compressor(encoding, gzip_level=6, brotli_quality=4):
+    if encoding == "br":
+        return BrotliCompressor(brotli_quality)
+    return GzipCompressor(gzip_level)
+
+
+def compress(encoding, data: bytes, gzip_level=6, brotli_quality=4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressionResponder:
+    def __init__(self, send, encoding, minimum_size, gzip_level, brotli_quality):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    def set_encoding_headers(self, content_length=None):
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            add_vary_header(message)
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = "content-encoding" in headers or not is_compressible(headers.get("content-type", ""))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body:  # whole response in a single message
+                if len(body) < self.minimum_size:
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                body = compress(self.encoding, body, self.gzip_level, self.brotli_quality)
+                self.set_encoding_headers(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            # streaming response, compress chunk by chunk
+            self.compressor = get_compressor(self.encoding, self.gzip_level, self.brotli_quality)
+            self.set_encoding_headers()
+            await self.send(self.start_message)
+        body = self.compressor.compress(body)
+        if not more_body:
+            body += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+def add_vary_header(message):
+    # compressed or not, every response depends on Accept-Encoding: without Vary a shared cache could serve the
+    # variant of one client to all the others
+    headers = MutableHeaders(raw=message["headers"])
+    if "accept-encoding" not in headers.get("vary", "").lower():  # i.e. precompressed responses set it themselves
+        headers.add_vary_header("Accept-Encoding")
+
+
+async def send_uncompressed(send, message):
+    if message["type"] == "http.response.start":
+        add_vary_header(message)
+    await send(message)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=500, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, partial(send_uncompressed, send))
+            return
+        responder = CompressionResponder(send, encoding, self.minimum_size, self.gzip_level, self.brotli_quality)
+        await self.app(scope, receive, responder)
+
+
+def precompress(data: bytes, gzip_level=9, brotli_quality=11) -> dict[str | None, bytes]:
+    return {None: data, **{encoding: compress(encoding, data, gzip_level, brotli_quality) for encoding in SUPPORTED_ENCODINGS}}
+
+
+def serve_precompressed(app, path, data: bytes, media_type="application/json"):
+    # Replaces the route at path with one serving variants compressed once at startup with maximum levels
+    variants = precompress(data)
+
+    async def endpoint(request: Request):
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(variants[encoding], media_type=media_type, headers=headers)
+
+    app.router.routes[:] = [route for route in app.router.routes if getattr(route, "path", None) != path]
+    app.add_route(path, endpoint, include_in_schema=False)
@@ -1,4 +1,6 @@
-from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, contextmanager, suppress
 from typing import TypeVar
 
 import asyncpg
@@ -9,6 +11,11 @@ from api import db
 
 ModelType = TypeVar("ModelType")
 
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 0.5  # seconds before the first reconnect attempt of a listener, doubled after each failed one
+RECONNECT_MAX_DELAY = 30
+
 
 @contextmanager
 def safe_db_write():
@@ -66,6 +73,7 @@ async def get_object(
     load_data=True,
     atomic_update=False,
     fixed_filters={},
+    fields=(),
 ) -> ModelType:
     if custom_query is not None:
         query = custom_query
@@ -74,6 +82,8 @@ async def get_object(
         if user:
             query = model.access_filter(user, query)
         query = apply_filters(model, query, fixed_filters)
+    if fields:
+        query = select_fields(model, query, fields)
     if atomic_update:
         query = query.with_for_update()
     item = await query.gino.first()
@@ -91,9 +101,25 @@ async def get_scalar(query, func, column, use_distinct=True):
     return await query.with_only_columns([func(column)]).order_by(None).gino.scalar() or 0
 
 
+def get_affected_rows(status):
+    # gino status() returns (status message, rows), i.e. ("DELETE 3", [])
+    count = status[0].rsplit(" ", 1)[-1]
+    return int(count) if count.isdigit() else 0
+
+
+async def run_chunked(ids, chunk_size, func):
+    """Awaits func on the unique ids in chunks of chunk_size and sums the affected row counts it returns"""
+    # one statement per chunk keeps both the id lists and how long locks are held bounded
+    ids = list(dict.fromkeys(ids))
+    affected = 0
+    for start in range(0, len(ids), chunk_size):
+        affected += await func(ids[start : start + chunk_size])
+    return affected
+
+
 async def postprocess_func(items):
-    for item in items:
-        await item.load_data()
+    if items:
+        await items[0].load_data_many(items)
     return items
 
 
@@ -108,12 +134,86 @@ async def iterate_helper():
             yield
 
 
+def select_fields(model, query, fields):
+    # Narrow the select list to the requested columns (id is always loaded), others are left as None on the model
+    columns = ["id"] + [field for field in fields if field != "id" and field in model.__table__.columns]
+    return query.with_only_columns([getattr(model, column) for column in columns]).execution_options(
+        loader=model.load(*columns)
+    )
+
+
 def apply_filters(model, query, filters):
     return query.where(and_(*[getattr(model, k) == v for k, v in filters.items()]))
 
 
-async def get_objects(model, ids, postprocess=True):  # TODO: maybe use iterate instead?
-    data = await model.query.where(model.id.in_(ids)).gino.all()
+async def get_objects(model, ids, postprocess=True, user=None, fixed_filters={}, fields=()):
+    """Objects with the given ids in one query, in the order of ``ids``; ids not found (or not accessible) are skipped"""
+    query = model.query.where(model.id.in_(ids))
+    if user:
+        query = model.access_filter(user, query)
+    query = apply_filters(model, query, fixed_filters)
+    if fields:
+        query = select_fields(model, query, fields)
+    found = {item.id: item for item in await query.gino.all()}
+    data = [found[model_id] for model_id in dict.fromkeys(ids) if model_id in found]
     if postprocess:
         await postprocess_func(data)
     return data
+
+
+class Listener:
+    """A dedicated LISTEN connection to a channel, reconnected with backoff when it's lost.
+
+    Notifications sent while it's down are lost, ``on_reconnect`` is called after reconnecting to make up for them.
+    """
+
+    def __init__(self, channel, callback, on_reconnect=None):
+        self.channel = channel
+        self.callback = callback
+        self.on_reconnect = on_reconnect
+        self.dsn = None
+        self.connection = None
+        self.disconnected = None
+        self.task = None
+
+    async def connect(self):
+        connection = await asyncpg.connect(self.dsn)
+        connection.add_termination_listener(self.on_terminate)
+        await connection.add_listener(self.channel, self.callback)
+        self.connection = connection
+
+    def on_terminate(self, connection):
+        if connection is self.connection:  # not closed by stop()
+            self.disconnected.set()
+
+    async def reconnect(self):
+        while True:
+            await self.disconnected.wait()
+            self.disconnected.clear()
+            delay = RECONNECT_DELAY
+            while True:
+                logger.warning(f"Connection listening on {self.channel} lost, reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+                try:
+                    await self.connect()
+                    break
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            if self.on_reconnect:
+                self.on_reconnect()
+
+    async def start(self, dsn):
+        self.dsn = dsn
+        self.disconnected = asyncio.Event()  # of the running loop
+        await self.connect()
+        self.task = asyncio.create_task(self.reconnect())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        if self.connection:
+            connection, self.connection = self.connection, None
+            await connection.close()
@@ -0,0 +1,135 @@
+"""Live question feed: comment and solve events pushed to subscribed clients as server-sent events.
+
+Events are published with postgres NOTIFY, so every worker receives them on its listener connection and fans them out
+to its own subscribers. Each event is encoded once and the same bytes are queued for every subscriber. Queues are
+bounded: a client which doesn't keep up has its queue replaced with a single resync event, telling it to refetch the
+question, so that it never slows down publishing or the other subscribers. Events sent while the listener connection
+is down are lost, so after reconnecting every subscriber gets a resync event too.
+"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from contextlib import suppress
+
+from api import constants, utils
+from api.db import db
+
+NOTIFY_MAX_SIZE = 8000  # bytes, postgres limit of NOTIFY payloads
+
+
+def format_event(event, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+PING = b": ping\n\n"  # a comment line, keeps proxies from closing idle connections
+RESYNC = format_event("resync", {})
+
+
+class Subscriber:
+    __slots__ = ("queue",)
+
+    def __init__(self, max_size):
+        self.queue = asyncio.Queue(max_size)
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # drop the events it hasn't read yet, the client refetches the current state instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class LiveFeed:
+    def __init__(self):
+        self.subscribers = defaultdict(set)  # question id -> subscribers
+        self.queue_size = 100
+        # events sent while the listener was down were missed
+        self.listener = utils.database.Listener(constants.FEED_CHANNEL, self.on_notify, lambda: self.broadcast(RESYNC))
+        self.task = None
+
+    def subscribe(self, question_id):
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers[question_id].add(subscriber)
+        utils.metrics.FEED_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, question_id, subscriber):
+        subscribers = self.subscribers.get(question_id)
+        if subscribers is not None and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[question_id]
+            utils.metrics.FEED_SUBSCRIBERS.dec()
+
+    def on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        utils.metrics.EVENT_LAG.labels(message["event"]).observe(max(0, time.time() - message["sent"]))
+        subscribers = self.subscribers.get(message["data"]["question_id"])
+        if not subscribers:
+            return
+        frame = format_event(message["event"], message["data"])
+        for subscriber in subscribers:
+            subscriber.put(frame)
+
+    async def stream(self, question_id):
+        subscriber = self.subscribe(question_id)
+        try:
+            yield PING  # send the headers right away
+            while True:
+                frame = await subscriber.queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(question_id, subscriber)
+
+    def broadcast(self, frame):
+        for subscribers in list(self.subscribers.values()):
+            for subscriber in subscribers:
+                subscriber.put(frame)
+
+    async def run(self, heartbeat_interval):
+        # one timer for all connections instead of one per connection
+        while True:
+            await asyncio.sleep(heartbeat_interval)
+            for subscribers in list(self.subscribers.values()):
+                for subscriber in subscribers:
+                    if subscriber.queue.empty():
+                        subscriber.put(PING)
+
+    async def start(self, dsn, queue_size=100, heartbeat_interval=15):
+        self.queue_size = queue_size
+        await self.listener.start(dsn)
+        self.task = asyncio.create_task(self.run(heartbeat_interval))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        await self.listener.stop()
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+
+live_feed = LiveFeed()
+
+
+async def publish(question_id, event, data):
+    message = {"event": event, "data": {"question_id": question_id, **data}, "sent": time.time()}
+    payload = utils.serialization.dumps(message)
+    if len(payload) >= NOTIFY_MAX_SIZE:  # i.e. a long comment, clients fetch it instead
+        message["data"] = {"question_id": question_id, "truncated": True}
+        payload = utils.serialization.dumps(message)
+    await db.scalar(db.select([db.func.pg_notify(constants.FEED_CHANNEL, payload.decode())]))
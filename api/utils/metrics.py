@@ -0,0 +1,159 @@
+"""Prometheus metrics, aggregated across gunicorn workers via PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py)."""
+
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+import asyncpg
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+from api import db
+from api import settings as settings_module
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route name", ["route", "method", "status"]
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Number of SQL queries executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, float("inf")),
+)
+REQUEST_QUERIES_DURATION = Histogram(
+    "db_queries_duration_per_request_seconds", "Total time spent in SQL queries per request", ["route"]
+)
+QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL query latency")
+AUTH_DURATION = Histogram("auth_dependency_duration_seconds", "Time spent in the auth dependency")
+SERIALIZATION_DURATION = Histogram("serialization_duration_seconds", "Time spent dumping responses with orjson")
+EVENT_LAG = Histogram("event_bus_lag_seconds", "Delay between publishing an event and processing it", ["event"])
+FEED_SUBSCRIBERS = Gauge("live_feed_subscribers", "Open live feed connections", multiprocess_mode="livesum")
+POOL_SIZE = Gauge("db_pool_size", "Open connections in the DB pool", multiprocess_mode="livesum")
+POOL_IDLE = Gauge("db_pool_idle", "Idle connections in the DB pool", multiprocess_mode="livesum")
+POOL_MAX_SIZE = Gauge("db_pool_max_size", "Maximum size of the DB pool", multiprocess_mode="livesum")
+
+
+def timer(metric):
+    """metric.time(), or a no-op when metrics are disabled: in multiprocess mode every observation writes to mmap files"""
+    settings = settings_module.settings_ctx.get(None)
+    if settings is None or not settings.metrics_enabled:
+        return nullcontext()
+    return metric.time()
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "queries_duration")
+
+    def __init__(self):
+        self.queries = 0
+        self.queries_duration = 0.0
+
+
+request_metrics: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+# Called with (query, elapsed, result) after every SQL statement, see InstrumentedConnection
+query_hooks: list = []
+
+
+def observe_query(query, elapsed, result):
+    QUERY_DURATION.observe(elapsed)
+    metrics = request_metrics.get()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.queries_duration += elapsed
+    for hook in query_hooks:
+        hook(query, elapsed, result)
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    __slots__ = ()
+
+    # Both gino and asyncpg run all non-prepared statements through _do_execute
+    async def _do_execute(self, query, executor, timeout, *args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        try:
+            result, stmt = await super()._do_execute(query, executor, timeout, *args, **kwargs)
+            return result, stmt
+        finally:
+            observe_query(query, time.perf_counter() - start, result)
+
+
+def update_pool_stats():
+    engine = db.db.bind
+    if not engine:  # not bound yet, gino returns a falsy placeholder
+        return
+    pool = engine.raw_pool
+    POOL_SIZE.set(pool.get_size())
+    POOL_IDLE.set(pool.get_idle_size())
+    POOL_MAX_SIZE.set(pool.get_max_size())
+
+
+def get_route_name(scope):
+    route = scope.get("route")
+    if route is not None:
+        return route.name
+    # plain starlette routes only set the endpoint, raw paths would make label cardinality unbounded
+    return getattr(scope.get("endpoint"), "__name__", "unmatched")
+
+
+def is_event_stream(message) -> bool:
+    """Whether an http.response.start message starts server-sent events, which stay open as long as the client does"""
+    return any(name == b"content-type" and value.startswith(b"text/event-stream") for name, value in message["headers"])
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        event_stream = False
+
+        async def send_wrapper(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = is_event_stream(message)
+            await send(message)
+
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_metrics.reset(token)
+            route = get_route_name(scope)
+            if not event_stream:  # its duration is how long the client stayed subscribed, not latency
+                REQUEST_DURATION.labels(route, scope["method"], status).observe(elapsed)
+            REQUEST_QUERIES.labels(route).observe(metrics.queries)
+            REQUEST_QUERIES_DURATION.labels(route).observe(metrics.queries_duration)
+            update_pool_stats()
+
+
+def get_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+async def metrics_endpoint(request: Request):
+    return Response(generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -1,42 +1,115 @@
+import asyncio
 import json
+import logging
+from contextlib import suppress
 from typing import TypeVar
 
-from api import models, utils
+from sqlalchemy import Text, bindparam, cast
+from sqlalchemy.dialects.postgresql import JSONB
+
+from api import constants, models, utils
+from api.db import db
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+
+class SettingsCache:
+    """Per-worker snapshot of the settings table.
+
+    Writes notify every worker through postgres LISTEN/NOTIFY to reload it. The listener connection reloads once it
+    reconnects, and a periodic reload is a fallback. Returned settings objects are shared, so treat them as read-only.
+    """
+
+    def __init__(self):
+        self.values = None  # setting name -> parsed value, None until loaded
+        self.instances = {}  # scheme -> initialized instance
+        self.version = 0
+        self.lock = asyncio.Lock()
+        self.listener = utils.database.Listener(constants.SETTINGS_CHANNEL, self.on_notify, self.schedule_reload)
+        self.task = None
+        self.reload_task = None
+
+    async def load(self):
+        rows = await models.Setting.query.gino.all()
+        self.values = {row.name: json.loads(row.value) for row in rows}
+        self.instances = {}
+        self.version += 1
+
+    async def get(self, scheme: T) -> T:
+        instance = self.instances.get(scheme)
+        if instance is not None:
+            return instance
+        if self.values is None:  # i.e. scripts running without the app lifespan
+            async with self.lock:
+                if self.values is None:
+                    await self.load()
+        version = self.version
+        instance = scheme(**self.values.get(scheme.__name__.lower(), {}))
+        if hasattr(instance, "async_init"):
+            await instance.async_init()
+        if version == self.version:  # don't cache an instance built from a snapshot replaced meanwhile
+            self.instances[scheme] = instance
+        return instance
+
+    def on_notify(self, connection, pid, channel, payload):
+        self.schedule_reload()
+
+    def schedule_reload(self):
+        self.reload_task = asyncio.ensure_future(self.reload())  # keep a reference until it's done
+
+    async def reload(self):
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to reload settings")
+
+    async def run(self, refresh_interval):
+        while True:
+            await asyncio.sleep(refresh_interval)
+            await self.reload()
+
+    async def start(self, dsn, refresh_interval=60):
+        await self.load()
+        await self.listener.start(dsn)
+        self.task = asyncio.create_task(self.run(refresh_interval))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+        await self.listener.stop()
+        self.values = None
+        self.instances = {}
+
+
+settings_cache = SettingsCache()
+
 
 async def get_setting(scheme: T) -> T:
-    name = scheme.__name__.lower()
-    item = await utils.database.get_object(
-        models.Setting, custom_query=models.Setting.query.where(models.Setting.name == name), raise_exception=False
-    )
-    if not item:
-        data = scheme()
-    else:
-        data = scheme(**json.loads(item.value))
-    if hasattr(data, "async_init"):
-        await data.async_init()
-    return data
+    return await settings_cache.get(scheme)
 
 
 async def set_setting(scheme):
     name = scheme.__class__.__name__.lower()
     json_data = scheme.model_dump(exclude_unset=True)
-    data = {"name": name, "value": json_data}
-    model = await utils.database.get_object(
-        models.Setting, custom_query=models.Setting.query.where(models.Setting.name == name), raise_exception=False
+    # merge into the stored value in one statement, so that concurrent writes of different keys don't get lost
+    # a row may hold SQL NULL or JSON null, merge into an empty document then instead of returning NULL
+    empty, null = db.literal_column("'{}'::jsonb"), db.literal_column("'null'::jsonb")
+    current = db.func.coalesce(db.func.nullif(cast(models.Setting.value, JSONB), null), empty)
+    merged = cast(current.op("||")(bindparam("value", json_data, type_=JSONB)), Text)
+    value = (
+        await models.Setting.update.values(value=merged)
+        .where(models.Setting.name == name)
+        .returning(models.Setting.value)
+        .gino.scalar()
     )
-    if model:
-        value = json.loads(model.value)
-        for key in json_data:
-            value[key] = json_data[key]
-        data["value"] = json.dumps(value)
-        await utils.database.modify_object(model, data)
-    else:
-        data["value"] = json.dumps(json_data)
-        await utils.database.create_object(models.Setting, data)
-    data = scheme.__class__(**json.loads(data["value"]))
-    if hasattr(data, "async_init"):
-        await data.async_init()
-    return data
+    if value is None:
+        value = json.dumps(json_data)
+        await utils.database.create_object(models.Setting, {"name": name, "value": value})
+    await db.scalar(db.select([db.func.pg_notify(constants.SETTINGS_CHANNEL, name)]))
+    await settings_cache.load()
+    return await settings_cache.get(scheme.__class__)
@@ -0,0 +1,149 @@
+"""Debug mode recording every SQL statement of a request, to find N+1 query patterns and slow requests."""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from starlette.datastructures import MutableHeaders
+
+from api import utils
+
+logger = logging.getLogger(__name__)
+slow_requests_logger = logging.getLogger(f"{__name__}.slow_requests")
+slow_requests_logger.propagate = False
+
+PARAM_RE = re.compile(r"\$\d+")
+PARAM_LIST_RE = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*")
+
+
+def get_row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):  # gino: (rows, status message, completed)
+        rows, status = result[0], result[1]
+        if rows:
+            return len(rows)
+        if isinstance(status, bytes):
+            status = status.decode()
+        count = (status or "").rsplit(" ", 1)[-1]  # i.e. UPDATE 3
+        return int(count) if count.isdigit() else 0
+    return None
+
+
+def normalize_query(query):
+    # IN lists of different length are still the same statement
+    return PARAM_LIST_RE.sub("?", query)
+
+
+class RequestTrace:
+    __slots__ = ("start", "queries", "event_stream")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+        self.event_stream = False  # not traced, its duration and queries are those of the whole subscription
+
+    def add_query(self, query, elapsed, result):
+        if self.event_stream:
+            return
+        self.queries.append(
+            {
+                "query": query,
+                "params": len(set(PARAM_RE.findall(query))),
+                "duration": elapsed,
+                "rows": get_row_count(result),
+            }
+        )
+
+    @property
+    def db_duration(self):
+        return sum(query["duration"] for query in self.queries)
+
+    def get_n_plus_one_suspects(self, threshold):
+        counts = Counter(normalize_query(query["query"]) for query in self.queries)
+        return {query: count for query, count in counts.items() if count >= threshold}
+
+
+request_trace: ContextVar[RequestTrace | None] = ContextVar("request_trace", default=None)
+
+
+def trace_query(query, elapsed, result):
+    trace = request_trace.get()
+    if trace is not None:
+        trace.add_query(query, elapsed, result)
+
+
+def format_server_timing(trace, suspects):
+    elapsed = time.perf_counter() - trace.start
+    timings = [
+        f'db;dur={trace.db_duration * 1000:.2f};desc="{len(trace.queries)} queries"',
+        f"app;dur={elapsed * 1000:.2f}",
+    ]
+    if suspects:
+        timings.append(f'n1;desc="{len(suspects)} N+1 suspects"')
+    return ", ".join(timings)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, slow_request_threshold=0.5, n_plus_one_threshold=5, log_file=None, max_bytes=0, backup_count=0):
+        self.app = app
+        self.slow_request_threshold = slow_request_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+        if log_file and not slow_requests_logger.handlers:
+            slow_requests_logger.addHandler(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count))
+            slow_requests_logger.setLevel(logging.INFO)
+        if trace_query not in utils.metrics.query_hooks:
+            utils.metrics.query_hooks.append(trace_query)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                trace.event_stream = utils.metrics.is_event_stream(message)
+                suspects = trace.get_n_plus_one_suspects(self.n_plus_one_threshold)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", format_server_timing(trace, suspects))
+            await send(message)
+
+        token = request_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_trace.reset(token)
+            self.report(scope, status, trace)
+
+    def report(self, scope, status, trace):
+        if trace.event_stream:
+            return
+        elapsed = time.perf_counter() - trace.start
+        suspects = trace.get_n_plus_one_suspects(self.n_plus_one_threshold)
+        for query, count in suspects.items():
+            logger.warning(f"Possible N+1 in {scope['method']} {scope['path']}: {count} times {query}")
+        if elapsed < self.slow_request_threshold:
+            return
+        slow_requests_logger.info(
+            json.dumps(
+                {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query_string": scope["query_string"].decode(),
+                    "status": status,
+                    "duration": elapsed,
+                    "db_duration": trace.db_duration,
+                    "n_plus_one_suspects": suspects,
+                    "queries": trace.queries,
+                }
+            )
+        )
@@ -1,20 +1,25 @@
 import inspect
+import logging
+import time
 from collections import defaultdict
 from collections.abc import Callable
 from dataclasses import dataclass
+from functools import cache
 from os.path import join as path_join
 from typing import Any, ClassVar
 
-from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
 from pydantic import BaseModel
 from pydantic import create_model as create_pydantic_model
 from starlette.requests import Request
 
-from api import db, events, pagination, utils
+from api import constants, db, events, pagination, utils
+
+logger = logging.getLogger(__name__)
 
 HTTP_METHODS: list[str] = ["GET", "POST", "PATCH", "DELETE"]
-ENDPOINTS: list[str] = ["get_all", "get_one", "get_count", "post", "patch", "delete", "batch_action"]
-CUSTOM_HTTP_METHODS: dict = {"batch_action": "post"}
+ENDPOINTS: list[str] = ["get_all", "get_one", "get_many", "get_count", "post", "patch", "delete", "batch_action"]
+CUSTOM_HTTP_METHODS: dict = {"get_many": "post", "batch_action": "post"}
 
 
 def reconstruct_signature(func, func_params: dict[str, type]):
@@ -50,6 +55,8 @@ class ModelView:
     from api import schemes
 
     crud_models: ClassVar[list] = []
+    views: ClassVar[list["ModelView"]] = []
+    build_times: ClassVar[dict[str, float]] = {}
 
     router: APIRouter
     path: str
@@ -67,6 +74,7 @@ class ModelView:
     using_router: bool
     response_models: dict[str, BaseModel]
     path_params: dict[str, Any]
+    fast_response: bool
 
     @classmethod
     def register(
@@ -77,7 +85,7 @@ class ModelView:
         pydantic_model,
         create_model=None,
         display_model=None,
-        allowed_methods: list[str] = ["GET_COUNT", "GET_ONE"] + HTTP_METHODS + ["BATCH_ACTION"],
+        allowed_methods: list[str] = ["GET_COUNT", "GET_ONE", "GET_MANY"] + HTTP_METHODS + ["BATCH_ACTION"],
         custom_methods: dict[str, Callable] = {},
         background_tasks_mapping: dict[str, Callable] = {},
         request_handlers: dict[str, Callable] = {},
@@ -87,7 +95,9 @@ class ModelView:
         using_router=True,
         response_models: dict[str, BaseModel] = {},
         path_params: dict[str, Any] = {},
+        fast_response=False,
     ):
+        start = time.perf_counter()
         # add to crud_models
         if scopes is None:  # pragma: no cover
             scopes = {i: [] for i in ENDPOINTS}
@@ -97,10 +107,12 @@ class ModelView:
             scopes_list = scopes.copy()
             scopes = {i: scopes_list for i in ENDPOINTS}
         scopes = defaultdict(list, **scopes)
+        if "get_many" not in scopes:
+            scopes["get_many"] = scopes["get_one"]
 
         if not create_model:
             create_model = pydantic_model  # pragma: no cover
-        cls(
+        view = cls(
             router=router,
             path=path,
             orm_model=orm_model,
@@ -117,7 +129,15 @@ class ModelView:
             using_router=using_router,
             response_models=response_models,
             path_params=path_params,
-        ).register_routes()
+            fast_response=fast_response,
+        )
+        view.register_routes()
+        cls.views.append(view)
+        cls.build_times[view.name] = cls.build_times.get(view.name, 0) + time.perf_counter() - start
+
+    @property
+    def name(self) -> str:
+        return f"{self.orm_model.__name__} {self.path}"  # a model may be served by several views
 
     def prepare_path_params(self, handler):
         return reconstruct_signature(handler, self.path_params)
@@ -126,6 +146,7 @@ class ModelView:
         response_models = self.get_response_models()
         paths = self.get_paths()
         names = self.get_names()
+        descriptions = self.get_descriptions()
         for method in self.allowed_methods:
             method_name = method.lower()
             handler = (
@@ -138,6 +159,7 @@ class ModelView:
                 paths.get(method_name),
                 handler,
                 name=names.get(method_name),
+                description=descriptions.get(method_name),
                 methods=[method_name if method in HTTP_METHODS else CUSTOM_HTTP_METHODS.get(method_name, "get")],
                 response_model=self.response_models.get(method_name, response_models.get(method_name)),
             )
@@ -146,6 +168,7 @@ class ModelView:
         item_path = path_join(self.path, "{model_id}")
         batch_path = path_join(self.path, "batch")
         count_path = path_join(self.path, "count")
+        many_path = path_join(self.path, "many")
         base_path = self.path
         if self.using_router:
             base_path = base_path.lstrip("/")
@@ -153,6 +176,7 @@ class ModelView:
             "get": base_path,
             "get_count": count_path,
             "get_one": item_path,
+            "get_many": many_path,
             "post": base_path,
             "patch": item_path,
             "delete": item_path,
@@ -164,29 +188,47 @@ class ModelView:
             "get": f"Get {self.orm_model.__name__}s",
             "get_count": f"Get number of {self.orm_model.__name__}s",
             "get_one": f"Get {self.orm_model.__name__} by id",
+            "get_many": f"Get {self.orm_model.__name__}s by ids",
             "post": f"Create {self.orm_model.__name__}",
             "patch": f"Modify {self.orm_model.__name__}",
             "delete": f"Delete {self.orm_model.__name__}",
             "batch_action": f"Batch actions on {self.orm_model.__name__}s",
         }
 
+    def get_descriptions(self) -> dict[str, str]:
+        # the response model documents full objects, fields= narrows them down
+        projection = (
+            "With `fields`, objects only contain the listed fields: the response schema describes the full object, "
+            "fields not listed are omitted rather than set to null."
+        )
+        return {"get": projection, "get_one": projection, "get_many": projection}
+
+    def get_display_model(self):
+        return self.pydantic_model if not self.display_model else self.display_model
+
     def get_response_models(self) -> dict[str, type]:
-        display_model = self.pydantic_model if not self.display_model else self.display_model
+        display_model = self.get_display_model()
         pagination_response = get_pagination_model(display_model)
         return {
             "get": pagination_response,
             "get_count": int,
             "get_one": display_model if self.get_one_model else None,
+            "get_many": get_many_model(display_model) if self.get_one_model else None,
             "post": display_model,
             "patch": display_model,
             "delete": display_model,
+            "batch_action": ModelView.schemes.BatchResult,
         }
 
+    def use_fast_response(self, method):
+        # dump ORM objects directly with orjson, skipping response_model revalidation
+        return self.fast_response and method not in self.response_models
+
     def sanitized_path_params(self, request):
         return {k: v for k, v in request.path_params.items() if k in self.path_params}
 
-    async def _get_one_internal(self, model_id: str, user: schemes.User, internal: bool = False, fixed_filters={}):
-        item = await utils.database.get_object(self.orm_model, model_id, user, fixed_filters=fixed_filters)
+    async def _get_one_internal(self, model_id: str, user: schemes.User, internal: bool = False, fixed_filters={}, fields=()):
+        item = await utils.database.get_object(self.orm_model, model_id, user, fixed_filters=fixed_filters, fields=fields)
         if self.custom_methods.get("get_one"):
             item = await self.custom_methods["get_one"](model_id, user, item, internal)
         return item
@@ -199,12 +241,16 @@ class ModelView:
             **kwargs,
         ):
             params = utils.common.prepare_query_params(request)
+            utils.serialization.validate_fields(self.get_display_model(), pagination.fields)
             if self.custom_methods.get("get"):
                 return await self.custom_methods["get"](pagination, user, **params)  # pragma: no cover
             else:
-                return await utils.database.paginate_object(
+                data = await utils.database.paginate_object(
                     self.orm_model, pagination, user, fixed_filters=self.sanitized_path_params(request), **params
                 )
+                if pagination.fields or self.use_fast_response("get"):
+                    return utils.serialization.serialize_pagination(self.get_display_model(), data, pagination.fields)
+                return data
 
         return get
 
@@ -231,12 +277,46 @@ class ModelView:
             request: Request,
             model_id: str,
             user: ModelView.schemes.User | None = Security(utils.authorization.auth_dependency, scopes=self.scopes["get_one"]),
+            fields: str = Query(default="", description=constants.FIELDS_DESCRIPTION),
             **kwargs,
         ):
-            return await self._get_one_internal(model_id, user, fixed_filters=self.sanitized_path_params(request))
+            fields = utils.serialization.validate_fields(self.get_display_model(), utils.common.parse_fields(fields))
+            item = await self._get_one_internal(
+                model_id, user, fixed_filters=self.sanitized_path_params(request), fields=fields
+            )
+            if self.get_one_model and (fields or self.use_fast_response("get_one")):
+                return utils.serialization.serialize_object(self.get_display_model(), item, fields)
+            return item
 
         return get_one
 
+    def _get_many(self):
+        async def get_many(
+            request: Request,
+            settings: ModelView.schemes.GetManySettings,
+            user: ModelView.schemes.User | None = Security(
+                utils.authorization.auth_dependency, scopes=self.scopes["get_many"]
+            ),
+            fields: str = Query(default="", description=constants.FIELDS_DESCRIPTION),
+            **kwargs,
+        ):
+            fields = utils.serialization.validate_fields(self.get_display_model(), utils.common.parse_fields(fields))
+            items = await utils.database.get_objects(
+                self.orm_model, settings.ids, user=user, fixed_filters=self.sanitized_path_params(request), fields=fields
+            )
+            if self.custom_methods.get("get_one"):
+                items = [await self.custom_methods["get_one"](item.id, user, item, False) for item in items]
+            found = {item.id for item in items}
+            data = {
+                "result": items,
+                "missing": [model_id for model_id in dict.fromkeys(settings.ids) if model_id not in found],
+            }
+            if self.get_one_model and (fields or self.use_fast_response("get_many")):
+                return utils.serialization.serialize_pagination(self.get_display_model(), data, fields)
+            return data
+
+        return get_many
+
     def _post(self):
         async def post(
             request: Request,
@@ -295,6 +375,22 @@ class ModelView:
         if command == "delete":
             return self.orm_model.delete
 
+    def filter_batch_query(self, request, query, user, ids):
+        query = self.orm_model.access_filter(user, query)
+        query = query.where(self.orm_model.id.in_(ids))
+        return utils.database.apply_filters(self.orm_model, query, self.sanitized_path_params(request))
+
+    async def run_batch_chunk(self, request, settings, user, ids):
+        query = self.filter_batch_query(request, self.process_command(settings.command), user, ids)
+        async with db.db.transaction():
+            if self.custom_methods.get("batch_action"):
+                return await self.custom_methods["batch_action"](query, settings, user) or 0  # pragma: no cover
+            if settings.command == "delete" and self.orm_model.get_m2m_keys():
+                # relations of the rows the filters let through, in one statement per relation table
+                allowed = self.filter_batch_query(request, self.orm_model.query, user, ids)
+                await self.orm_model.delete_related_many(allowed.with_only_columns([self.orm_model.id]))
+            return utils.database.get_affected_rows(await query.gino.status())
+
     def _batch_action(self):
         async def batch_action(
             request: Request,
@@ -302,21 +398,39 @@ class ModelView:
             user: ModelView.schemes.User = Security(utils.authorization.auth_dependency, scopes=self.scopes["batch_action"]),
             **kwargs,
         ):
-            query = self.process_command(settings.command)
-            if query is None:
+            if self.process_command(settings.command) is None:
                 raise HTTPException(status_code=404, detail="Batch command not found")
-            query = self.orm_model.access_filter(user, query)
-            query = query.where(self.orm_model.id.in_(settings.ids))
-            query = utils.database.apply_filters(self.orm_model, query, self.sanitized_path_params(request))
-            if self.custom_methods.get("batch_action"):
-                await self.custom_methods["batch_action"](query, settings, user)  # pragma: no cover
-            else:  # pragma: no cover
-                await query.gino.status()
-            return True
+            affected = await utils.database.run_chunked(
+                settings.ids,
+                request.app.settings.batch_chunk_size,
+                lambda ids: self.run_batch_chunk(request, settings, user, ids),
+            )
+            return {"command": settings.command, "affected": affected}
 
         return batch_action
 
 
+def warmup(app=None):
+    """Build models and schemas which are otherwise created lazily on first use, i.e. in gunicorn master before fork"""
+    for view in ModelView.views:
+        start = time.perf_counter()
+        for model in (view.create_model, view.pydantic_model, utils.schemes.to_optional(view.pydantic_model)):
+            ModelView.schemes.get_schema_properties(model)
+        utils.serialization.get_field_plan(view.get_display_model())
+        ModelView.build_times[view.name] = ModelView.build_times.get(view.name, 0) + time.perf_counter() - start
+    if app is not None:
+        start = time.perf_counter()
+        app.openapi()
+        ModelView.build_times["openapi schema"] = time.perf_counter() - start
+
+
+def report_build_times(log=logger):
+    """Log view build times, gunicorn hooks pass their own logger as the app's loggers aren't configured there"""
+    for name, build_time in ModelView.build_times.items():
+        log.info(f"Built {name} in {build_time * 1000:.1f}ms")
+
+
+@cache  # one model per display model, shared by all views
 def get_pagination_model(display_model):
     return create_pydantic_model(
         f"PaginationResponse_{display_model.__name__}",
@@ -326,3 +440,13 @@ def get_pagination_model(display_model):
         result=(list[display_model], ...),
         __base__=BaseModel,
     )
+
+
+@cache
+def get_many_model(display_model):
+    return create_pydantic_model(
+        f"GetManyResponse_{display_model.__name__}",
+        result=(list[display_model], ...),
+        missing=(list[str], ...),
+        __base__=BaseModel,
+    )
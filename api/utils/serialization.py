@@ -0,0 +1,75 @@
+from decimal import Decimal
+from functools import lru_cache
+
+import orjson
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from starlette.responses import JSONResponse
+
+from api import utils
+
+
+def default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, default=default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class FieldPlan:
+    """Precomputed list of fields to dump ORM objects without revalidating them against the display model"""
+
+    def __init__(self, display_model: type[BaseModel], fields: tuple[str, ...] = ()):
+        self.fields = []
+        for name, field in display_model.model_fields.items():
+            if fields and name not in fields:
+                continue
+            field_default = field.get_default(call_default_factory=True)
+            self.fields.append((name, None if field_default is PydanticUndefined else field_default))
+
+    def dump(self, obj) -> dict:
+        data = {}
+        for name, field_default in self.fields:
+            value = getattr(obj, name, field_default)
+            if value.__class__ is str and not value:  # same as DisplayModel.remove_hidden, empty strings trigger defaults
+                value = field_default
+            data[name] = value
+        return data
+
+    def dump_many(self, items) -> list[dict]:
+        dump = self.dump
+        return [dump(obj) for obj in items]
+
+
+@lru_cache(maxsize=256)
+def get_field_plan(display_model: type[BaseModel], fields: tuple[str, ...] = ()) -> FieldPlan:
+    return FieldPlan(display_model, fields)
+
+
+def validate_fields(display_model, fields):
+    unknown = [field for field in fields if field not in display_model.model_fields]
+    if unknown:
+        raise HTTPException(422, f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def serialize_object(display_model, obj, fields=()) -> ORJSONResponse:
+    with utils.metrics.timer(utils.metrics.SERIALIZATION_DURATION):
+        return ORJSONResponse(get_field_plan(display_model, fields).dump(obj))
+
+
+def serialize_pagination(display_model, data: dict, fields=()) -> ORJSONResponse:
+    with utils.metrics.timer(utils.metrics.SERIALIZATION_DURATION):
+        return ORJSONResponse({**data, "result": get_field_plan(display_model, fields).dump_many(data["result"])})
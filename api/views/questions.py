@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Security
+import asyncpg
+from fastapi import APIRouter, HTTPException, Query, Request, Security
 from pydantic import BaseModel
+from starlette.responses import StreamingResponse
 
 from api import models, schemes, utils
 
@@ -14,27 +16,65 @@ class SolveMessage(BaseModel):
     answer: str
 
 
-@router.post("/{model_id}/comment", response_model=schemes.DisplayQuestion)
+@router.post("/{model_id}/comment", response_model=schemes.DisplayCommentCount)
 async def submit_comment(
-    model_id: str, message: SubmitMessage, user: models.User = Security(utils.authorization.auth_dependency, scopes=[])
+    request: Request,
+    model_id: str,
+    message: SubmitMessage,
+    user: models.User = Security(utils.authorization.auth_dependency, scopes=[]),
 ):
-    question = await utils.database.get_object(models.Question, model_id)
-    question.comments.append({"email": user.email, "message": message.message})
-    await question.update(comments=question.comments).apply()
-    return question
+    comment = {"email": user.email, "message": message.message, "created": utils.time.now()}
+    buffer = request.app.comment_buffer
+    if buffer:
+        question = await utils.database.get_object(models.Question, model_id, load_data=False, fields=("id", "comment_count"))
+        await buffer.add(question.id, comment)
+        comment_count = question.comment_count + len(buffer.get_pending(question.id))
+    else:
+        try:
+            comment_count = await utils.comments.append_comments(model_id, [comment])
+        except asyncpg.ForeignKeyViolationError:  # the question doesn't exist
+            raise HTTPException(status_code=404, detail=f"Question with id {model_id} does not exist!")
+    return {"id": model_id, "comment_count": comment_count}
 
 
-@router.post("/{model_id}/solve", response_model=schemes.DisplayQuestion)
+@router.get("/{model_id}/comments", response_model=schemes.CommentPage)
+async def get_comments(
+    request: Request,
+    model_id: str,
+    after: str | None = Query(default=None, description="Id of the last comment of the previous page"),
+    limit: int = Query(default=20, ge=1, le=100),
+    user: models.User = Security(utils.authorization.auth_dependency, scopes=[]),
+):
+    await utils.database.get_object(models.Question, model_id, load_data=False, fields=("id",))
+    comments, has_more = await utils.comments.get_comments(model_id, after, limit)
+    next_url = str(request.url.include_query_params(after=comments[-1].id, limit=limit)) if has_more else None
+    return utils.serialization.serialize_pagination(schemes.DisplayComment, {"next": next_url, "result": comments})
+
+
+@router.post("/{model_id}/solve", response_model=schemes.DisplaySolve)
 async def submit_solve(
     model_id: str, solution: SolveMessage, user: models.User = Security(utils.authorization.auth_dependency, scopes=[])
 ):
-    question = await utils.database.get_object(models.Question, model_id)
-    if question.answer != solution.answer:
+    result = await models.Question.solve(model_id, solution.answer, user.email)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"Question with id {model_id} does not exist!")
+    if not result.correct:
         raise HTTPException(status_code=400, detail="Wrong answer")
-    question.solutions.append(user.email)
-    question.solutions = list(set(question.solutions))
-    await question.update(solutions=question.solutions).apply()
-    return question
+    return {"id": result.id, "solution_count": result.solution_count}
+
+
+@router.get("/{model_id}/events")
+async def question_events(model_id: str, user: models.User = Security(utils.authorization.auth_dependency, scopes=[])):
+    """Server-sent events of new comments and solves of a question, instead of polling it.
+
+    Events are ``comment`` and ``solve``; on ``resync`` the client fell behind and should refetch the question.
+    """
+    await utils.database.get_object(models.Question, model_id, load_data=False, fields=("id",))
+    return StreamingResponse(
+        utils.feed.live_feed.stream(model_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 utils.routing.ModelView.register(
@@ -52,4 +92,5 @@ utils.routing.ModelView.register(
         "patch": ["admin_access"],
         "delete": ["admin_access"],
     },
+    fast_response=True,
 )
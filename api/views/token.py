@@ -29,8 +29,9 @@ async def delete_token(
     return item
 
 
-@router.post("/batch")
+@router.post("/batch", response_model=schemes.BatchResult)
 async def batch_action(
+    request: Request,
     settings: schemes.BatchSettings,
     user: models.User = Security(utils.authorization.auth_dependency, scopes=["token_management"]),
 ):  # pragma: no cover
@@ -39,9 +40,13 @@ async def batch_action(
         query = models.Token.delete
     if query is None:
         raise HTTPException(status_code=404, detail="Batch command not found")
-    query = query.where(models.Token.user_id == user.id).where(models.Token.id.in_(settings.ids))
-    await query.gino.status()
-    return True
+    query = query.where(models.Token.user_id == user.id)
+
+    async def run_chunk(ids):
+        return utils.database.get_affected_rows(await query.where(models.Token.id.in_(ids)).gino.status())
+
+    affected = await utils.database.run_chunked(settings.ids, request.app.settings.batch_chunk_size, run_chunk)
+    return {"command": settings.command, "affected": affected}
 
 
 async def validate_credentials(user, token_data):
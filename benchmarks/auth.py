@@ -0,0 +1,80 @@
+"""Per-request CPU overhead of the auth dependency permission checks.
+
+Run with ``python -m benchmarks.auth``
+"""
+
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from api.utils import authorization
+from benchmarks.utils import measure, report
+
+
+# Implementation before scopes were interned to bitmasks, kept for comparison
+def legacy_get_authenticate_value(scopes):
+    return f'Bearer scope="{" ".join(scopes)}"' if scopes else "Bearer"
+
+
+def legacy_check_permissions(user, token, scopes):
+    authenticate_value = legacy_get_authenticate_value(scopes)
+    available_permissions = set(user.permissions)
+    actual_scopes = set(token.scopes) if token else set(scopes)
+    if "full_control" in actual_scopes:
+        actual_scopes = available_permissions
+    else:
+        actual_scopes &= available_permissions
+    if "admin_access" in actual_scopes:
+        return
+    forbidden_exception = HTTPException(
+        status_code=HTTP_403_FORBIDDEN,
+        detail="Not enough permissions",
+        headers={"WWW-Authenticate": authenticate_value},
+    )
+    for scope in scopes:
+        if scope == "full_control":
+            continue
+        if scope not in actual_scopes:
+            raise forbidden_exception
+
+
+def legacy_dependency(user, token, scopes):
+    HTTPException(
+        status_code=HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": legacy_get_authenticate_value(scopes)},
+    )
+    legacy_check_permissions(user, token, scopes)
+
+
+def dependency(user, token, scopes):
+    authorization.check_permissions(user, token, scopes)
+
+
+CASES = {
+    "regular user, no scopes": ([], ["full_control"], []),
+    "regular user, scoped": (
+        ["token_management", "questions_read", "questions_write"],
+        ["token_management", "questions_read"],
+        ["token_management", "questions_read"],
+    ),
+    "admin, full_control": (["admin_access"], ["full_control"], ["admin_access"]),
+}
+
+
+def main():
+    for title, (permissions, token_scopes, scopes) in CASES.items():
+        user = SimpleNamespace(permissions=permissions)
+        token = SimpleNamespace(scopes=token_scopes)
+        report(
+            title,
+            {
+                "legacy": measure(lambda: legacy_dependency(user, token, scopes)),
+                "bitmask": measure(lambda: dependency(user, token, scopes)),
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmarks of per-request helpers, with baselines committed in benchmarks/baselines.
+
+Run with ``make microbenchmark``, which compares against the latest baseline.
+Save a new baseline after an intended improvement with ``make microbenchmark MICROBENCHMARK_ARGS=--benchmark-save=<name>``
+"""
+
+import pytest
+from starlette.requests import Request
+
+from api import pagination, schemes, utils
+
+SEARCH_QUERIES = {
+    "text": "binary search trees",
+    "filters": "topic:algorithms company:acme difficulty:medium heaps",
+    "dates": "start_date:-2w end_date:2024-10-30T01:48:35 topic:python",
+}
+
+
+def make_request(query_string=b"limit=20&offset=40&query=topic%3Aalgorithms&sort=created"):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": "/questions",
+            "root_path": "",
+            "query_string": query_string,
+            "headers": [(b"host", b"testserver")],
+        }
+    )
+
+
+def make_pagination(offset=40, limit=20):
+    return pagination.Pagination(
+        make_request(), offset=offset, limit=limit, query="", multiple=False, sort="", desc=True, fields=""
+    )
+
+
+@pytest.mark.parametrize("query", SEARCH_QUERIES.values(), ids=SEARCH_QUERIES.keys())
+def test_search_query_init(benchmark, query):
+    benchmark(utils.common.SearchQuery, query)
+
+
+@pytest.mark.parametrize("date", ["-2w", "2024-10-30T01:48:35"], ids=["relative", "iso"])
+def test_search_query_parse_datetime(benchmark, date):
+    search_query = utils.common.SearchQuery("")
+
+    def parse():
+        search_query.filters["start_date"] = [date]
+        return search_query.parse_datetime("start_date")
+
+    benchmark(parse)
+
+
+def test_pagination_next_url(benchmark):
+    benchmark(make_pagination().get_next_url, 1000)
+
+
+def test_pagination_previous_url(benchmark):
+    benchmark(make_pagination().get_previous_url)
+
+
+def test_unique_id(benchmark):
+    benchmark(utils.common.unique_id)
+
+
+def test_sortable_id(benchmark):
+    benchmark(utils.common.sortable_id)
+
+
+def test_to_optional(benchmark):
+    benchmark(utils.schemes.to_optional, schemes.UpdateQuestion)
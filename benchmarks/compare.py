@@ -0,0 +1,56 @@
+"""Compare two saved end-to-end benchmark results.
+
+Run with ``python -m benchmarks.compare old.json new.json``
+"""
+
+import argparse
+import json
+
+from benchmarks.utils import format_time
+
+METRICS = {"throughput": True, "p50": False, "p99": False, "connections": False}  # metric -> whether higher is better
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def format_value(metric, value):
+    if metric == "throughput":
+        return f"{value:.1f} req/s"
+    if metric == "connections":
+        return f"{value:.2f}"
+    return format_time(value)
+
+
+def compare(old, new):
+    print(f"{old['revision']} -> {new['revision']}")
+    for profile, new_stats in new["results"]["profiles"].items():
+        old_stats = old["results"]["profiles"].get(profile)
+        if old_stats is None:
+            continue
+        print(profile)
+        for metric, higher_is_better in METRICS.items():
+            if metric not in old_stats or metric not in new_stats:  # results saved before the metric was added
+                continue
+            old_value, new_value = old_stats[metric], new_stats[metric]
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            better = change > 0 if higher_is_better else change < 0
+            verdict = "better" if better and abs(change) >= 5 else "worse" if abs(change) >= 5 else "same"
+            print(
+                f"  {metric:<10} {format_value(metric, old_value):>12} -> {format_value(metric, new_value):>12}"
+                f"  {change:+6.1f}% {verdict}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    compare(load(args.old), load(args.new))
+
+
+if __name__ == "__main__":
+    main()
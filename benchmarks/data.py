@@ -0,0 +1,60 @@
+import random
+import secrets
+
+from api import utils
+
+TOPICS = ["algorithms", "databases", "networking", "system design", "python", "concurrency"]
+COMPANIES = ["acme", "globex", "initech", "umbrella", "hooli"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+SOURCES = ["import", "community", "staff"]
+PASSWORD = "benchmark"
+
+
+def user_data(i, hashed_password):
+    return {
+        "id": utils.common.unique_id(),
+        "email": f"user{i}@example.com",
+        "hashed_password": hashed_password,
+        "permissions": [],
+        "created": utils.time.now(),
+        "settings": {},
+        "metadata": {},
+    }
+
+
+def token_data(user_id):
+    return {
+        "id": secrets.token_urlsafe(),
+        "user_id": user_id,
+        "scopes": ["full_control"],
+        "created": utils.time.now(),
+        "metadata": {},
+    }
+
+
+def question_data(i, comments=10, solutions=10):
+    return {
+        "id": utils.common.unique_id(),
+        "name": f"Question {i}",
+        "question": "What is the time complexity of a binary search? " * 5,
+        "options": ["O(1)", "O(log n)", "O(n)", "O(n log n)"],
+        "answer": "O(log n)",
+        "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+        "topic": TOPICS[i % len(TOPICS)],
+        "company": random.choice(COMPANIES),
+        "hints": ["Think about halving", "Sorted input"],
+        "solutions": [f"user{j}@example.com" for j in range(solutions)],
+        "comment_count": comments,
+        "created": utils.time.now(),
+        "metadata": {"source": SOURCES[i % len(SOURCES)], "batch": i % 100},
+    }
+
+
+def comment_data(question_id, i):
+    return {
+        "id": utils.common.sortable_id(),
+        "question_id": question_id,
+        "email": f"user{i}@example.com",
+        "message": "Nice one " * 10,
+        "created": utils.time.now(),
+    }
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import asyncpg
+
+from api import models, utils
+from api.db import db
+from benchmarks.data import PASSWORD, comment_data, question_data, token_data, user_data
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_NAME = "interviewprepare_benchmark"
+CHUNK_SIZE = 1000
+
+
+def get_postgres_bindir():
+    initdb = shutil.which("initdb")
+    if initdb:
+        return os.path.dirname(initdb)
+    pg_config = shutil.which("pg_config")
+    if pg_config:
+        return subprocess.check_output([pg_config, "--bindir"], text=True).strip()
+    raise RuntimeError("PostgreSQL binaries not found, install postgres or pass --existing-db to use the docker-compose one")
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def temporary_cluster():
+    """Run a throwaway postgres cluster with initdb/pg_ctl, yielding DB_* environment variables"""
+    bindir = get_postgres_bindir()
+    port = get_free_port()
+    with tempfile.TemporaryDirectory(prefix="interviewprepare-pg-") as datadir:
+        subprocess.run(
+            [os.path.join(bindir, "initdb"), "-D", datadir, "-U", "postgres", "-A", "trust", "--no-sync"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        options = f"-p {port} -k {datadir} -c listen_addresses=127.0.0.1 -c fsync=off -c random_page_cost=1.0"
+        pg_ctl = os.path.join(bindir, "pg_ctl")
+        subprocess.run(
+            [pg_ctl, "-D", datadir, "-o", options, "-l", os.path.join(datadir, "postgres.log"), "-w", "start"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield {"DB_HOST": "127.0.0.1", "DB_PORT": str(port), "DB_USER": "postgres", "DB_PASSWORD": ""}
+        finally:
+            subprocess.run([pg_ctl, "-D", datadir, "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+
+
+@contextmanager
+def existing_database():
+    # i.e. the docker-compose database, configured with the usual DB_* variables
+    yield {key: os.environ[key] for key in ("DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD") if key in os.environ}
+
+
+async def recreate_database(env):
+    conn = await asyncpg.connect(
+        host=env.get("DB_HOST", "127.0.0.1"),
+        port=int(env.get("DB_PORT", 5432)),
+        user=env.get("DB_USER", "postgres"),
+        password=env.get("DB_PASSWORD", ""),
+        database="postgres",
+    )
+    try:
+        await conn.execute(f"DROP DATABASE IF EXISTS {DB_NAME}")
+        await conn.execute(f"CREATE DATABASE {DB_NAME}")
+    finally:
+        await conn.close()
+
+
+def prepare_database(env):
+    """Create an empty benchmark database with all migrations applied, and point the app settings to it"""
+    env = {**env, "DB_DATABASE": DB_NAME}
+    asyncio.run(recreate_database(env))
+    os.environ.update(env)
+    subprocess.run(["alembic", "upgrade", "head"], check=True, cwd=ROOT_DIR, env=os.environ.copy())
+    return env
+
+
+async def insert_chunked(model, rows):
+    for i in range(0, len(rows), CHUNK_SIZE):  # one multi-row INSERT per chunk
+        await model.insert().values(rows[i : i + CHUNK_SIZE]).gino.status()
+
+
+async def seed(users=100, questions=1000, comments=10, solutions=10):
+    """Fill the bound database, returning the data request profiles need"""
+    await db.status(db.text("TRUNCATE users, tokens, questions, comments, settings CASCADE"))
+    hashed_password = utils.authorization.get_password_hash(PASSWORD)  # bcrypt is slow, hash once
+    user_rows = [user_data(i, hashed_password) for i in range(users)]
+    token_rows = [token_data(user["id"]) for user in user_rows]
+    question_rows = [question_data(i, comments, solutions) for i in range(questions)]
+    comment_rows = [comment_data(question["id"], i) for question in question_rows for i in range(comments)]
+    await insert_chunked(models.User, user_rows)
+    await insert_chunked(models.Token, token_rows)
+    await insert_chunked(models.Question, question_rows)
+    await insert_chunked(models.Comment, comment_rows)
+    return {
+        "emails": [user["email"] for user in user_rows],
+        "tokens": [token["id"] for token in token_rows],
+        "questions": [(question["id"], question["answer"]) for question in question_rows],
+    }
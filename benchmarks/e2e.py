@@ -0,0 +1,151 @@
+"""End-to-end load profiles driving the real ASGI app against a seeded local postgres.
+
+Run with ``python -m benchmarks.e2e`` to use a temporary initdb cluster, or with ``--existing-db``
+to use the database configured by DB_* variables (i.e. the docker-compose one).
+Results are saved to benchmarks/results, compare two runs with ``python -m benchmarks.compare old.json new.json``
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from api.db import db
+from benchmarks.data import PASSWORD, TOPICS
+from benchmarks.database import existing_database, prepare_database, seed, temporary_cluster
+from benchmarks.utils import format_time, percentile, save_results
+
+
+def auth_headers(data):
+    return {"Authorization": f"Bearer {random.choice(data['tokens'])}"}
+
+
+async def list_search(client, data):
+    return await client.get("/questions", params={"query": random.choice(TOPICS), "limit": 20}, headers=auth_headers(data))
+
+
+async def get_one(client, data):
+    question_id, _ = random.choice(data["questions"])
+    return await client.get(f"/questions/{question_id}", headers=auth_headers(data))
+
+
+async def list_comments(client, data):
+    question_id, _ = random.choice(data["questions"])
+    return await client.get(f"/questions/{question_id}/comments", headers=auth_headers(data))
+
+
+async def login(client, data):
+    return await client.post("/token", json={"email": random.choice(data["emails"]), "password": PASSWORD})
+
+
+async def solve(client, data):
+    question_id, answer = random.choice(data["questions"])
+    return await client.post(f"/questions/{question_id}/solve", json={"answer": answer}, headers=auth_headers(data))
+
+
+async def comment(client, data):
+    question_id, _ = random.choice(data["questions"])
+    return await client.post(
+        f"/questions/{question_id}/comment", json={"message": "Benchmark comment"}, headers=auth_headers(data)
+    )
+
+
+MIXED_WEIGHTS = {list_search: 35, get_one: 35, list_comments: 10, solve: 10, comment: 8, login: 2}
+
+
+async def mixed(client, data):
+    func = random.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+    return await func(client, data)
+
+
+PROFILES = {
+    "list_search": list_search,
+    "get_one": get_one,
+    "list_comments": list_comments,
+    "login": login,
+    "solve": solve,
+    "comment": comment,
+    "mixed": mixed,
+}
+
+
+async def sample_pool(samples, interval=0.001):
+    pool = db.bind.raw_pool
+    while True:
+        samples.append(pool.get_size() - pool.get_idle_size())
+        await asyncio.sleep(interval)
+
+
+async def run_profile(client, data, func, concurrency, duration):
+    latencies = []
+    statuses = Counter()
+    connections = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await func(client, data)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    sampler = asyncio.create_task(sample_pool(connections))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "connections": sum(connections) / len(connections) if connections else 0.0,  # checked out pool connections
+        "max_connections": max(connections, default=0),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def run(args):
+    import main  # settings are read from the environment prepared above
+
+    app = main.get_app()
+    results = {}
+    async with app.router.lifespan_context(app):
+        data = await seed(args.users, args.questions, args.comments, args.solutions)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in args.profiles:
+                await run_profile(client, data, PROFILES[name], args.concurrency, args.warmup)
+                stats = results[name] = await run_profile(client, data, PROFILES[name], args.concurrency, args.duration)
+                print(
+                    f"{name:<12} {stats['throughput']:>8.1f} req/s  p50 {format_time(stats['p50'])}"
+                    f"  p99 {format_time(stats['p99'])}  errors {stats['errors']}"
+                    f"  connections {stats['connections']:.1f} (max {stats['max_connections']})"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing-db", action="store_true", help="use the DB_* database instead of a temporary cluster")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=10, help="comments per question")
+    parser.add_argument("--solutions", type=int, default=10, help="solutions per question")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per profile")
+    parser.add_argument("--warmup", type=float, default=1, help="seconds of warmup per profile")
+    args = parser.parse_args()
+    with existing_database() if args.existing_db else temporary_cluster() as env:
+        prepare_database(env)
+        results = asyncio.run(run(args))
+    print(f"Results saved to {save_results('e2e', {'config': vars(args), 'profiles': results})}")
+
+
+if __name__ == "__main__":
+    main()
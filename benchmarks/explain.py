@@ -0,0 +1,130 @@
+"""Query plans of paginated list queries, checking that sorted pages are served by an index.
+
+Each page query runs under EXPLAIN ANALYZE. Where the sort key has an index, the page query has no window count and the
+scan below the Limit node must stop after about limit + offset rows, with nothing between them (i.e. a WindowAgg or
+Sort) that reads the whole result. Other pages, like text searches, read every match anyway and count them in the same
+statement.
+
+Run with ``python -m benchmarks.explain`` to use a temporary initdb cluster, or with ``--existing-db``
+to use the database configured by DB_* variables. Exits with status 1 if a check fails.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from starlette.requests import Request
+
+from api import models, pagination
+from api.db import db
+from benchmarks.database import existing_database, prepare_database, seed, temporary_cluster
+
+# name -> (list query parameters, whether the plan must use an index, whether the scan must stop at limit + offset)
+CASES = {
+    "default": ({}, True, True),
+    "default_offset": ({"offset": 200}, True, True),
+    "sort_created": ({"sort": "created"}, True, True),
+    "sort_created_asc": ({"sort": "created", "desc": False}, True, True),
+    "sort_id": ({"sort": "id"}, True, True),
+    "filter_topic": ({"query": "topic:python"}, True, True),
+    "filter_metadata": ({"query": "meta.batch:7"}, True, False),
+    "filter_solutions": ({"query": "solutions:user1@example.com"}, False, False),
+    "search_text": ({"query": "python"}, False, False),
+}
+WINDOW_COUNT_CASES = {"search_text"}  # pages counted in the page query, as no index serves their order
+ROWS_SLACK = 1  # a scan may fetch one row past what Limit asks for
+
+
+class Explain(Executable, ClauseElement):
+    def __init__(self, query):
+        self.query = query
+
+
+@compiles(Explain)
+def compile_explain(element, compiler, **kwargs):
+    # parameters stay bound, not all of them can be inlined as literals (i.e. jsonb documents)
+    return f"EXPLAIN (ANALYZE, FORMAT JSON) {compiler.process(element.query, **kwargs)}"
+
+
+def make_pagination(params):
+    request = Request({"type": "http", "method": "GET", "path": "/questions", "query_string": b"", "headers": []})
+    params = {"offset": 0, "limit": 20, "query": "", "multiple": False, "sort": "", "desc": True, "fields": "", **params}
+    return pagination.Pagination(request, **params)
+
+
+def build_query(paginator):
+    """The page query Pagination.get_list runs"""
+    return paginator.get_page_query(paginator.get_base_query(models.Question))
+
+
+async def explain(query):
+    plan = await db.scalar(Explain(query))
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def walk(node, depth=0):
+    yield node, depth
+    for child in node.get("Plans", []):
+        yield from walk(child, depth + 1)
+
+
+def check_early_stop(plan):
+    """Nodes between Limit and the scan feeding it, and the rows that scan returned"""
+    node, between = plan, []
+    while node["Node Type"] != "Limit":
+        node = node["Plans"][0]
+    node = node["Plans"][0]
+    while "Scan" not in node["Node Type"]:
+        between.append(node["Node Type"])
+        node = node["Plans"][0]
+    return between, node["Actual Rows"]
+
+
+async def run(args):
+    import main  # settings are read from the environment prepared above
+
+    app = main.get_app()
+    failures = []
+    async with app.router.lifespan_context(app):
+        await seed(args.users, args.questions, comments=0, solutions=0)
+        await db.status(db.text("ANALYZE"))
+        for name, (params, needs_index, stops_early) in CASES.items():
+            paginator = make_pagination(params)
+            plan = await explain(build_query(paginator))
+            uses_index = any("Index" in node["Node Type"] for node, _ in walk(plan))
+            print(f"{name}: {'index scan' if uses_index else 'no index scan'}")
+            for node, depth in walk(plan):
+                print(f"    {'  ' * depth}{node['Node Type']} rows={node['Actual Rows']} {node.get('Index Name', '')}")
+            if needs_index and not uses_index:
+                failures.append(f"{name} (no index scan)")
+            has_window = any(node["Node Type"] == "WindowAgg" for node, _ in walk(plan))
+            if has_window != (name in WINDOW_COUNT_CASES):
+                failures.append(f"{name} ({'unexpected' if has_window else 'missing'} window count)")
+            if stops_early:
+                between, rows = check_early_stop(plan)
+                expected = paginator.limit + paginator.offset
+                print(f"    scanned {rows} rows for limit + offset = {expected}")
+                if between or rows > expected + ROWS_SLACK:
+                    failures.append(f"{name} ({' > '.join(between) or 'scan'} read {rows} rows, expected {expected})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing-db", action="store_true", help="use the DB_* database instead of a temporary cluster")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=20000)
+    args = parser.parse_args()
+    with existing_database() if args.existing_db else temporary_cluster() as env:
+        prepare_database(env)
+        failures = asyncio.run(run(args))
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
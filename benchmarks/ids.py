@@ -0,0 +1,73 @@
+"""Random vs time-ordered IDs: generation speed, and insert throughput and btree index size in postgres.
+
+Run with ``python -m benchmarks.ids`` to use a temporary initdb cluster, or with ``--existing-db``
+to use the database configured by DB_* variables.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import asyncpg
+
+from api import utils
+from benchmarks.database import DB_NAME, existing_database, recreate_database, temporary_cluster
+from benchmarks.utils import measure, report, save_results
+
+GENERATORS = {"unique_id": utils.common.unique_id, "sortable_id": utils.common.sortable_id}
+
+
+async def insert_benchmark(env, generator, rows, batch_size):
+    conn = await asyncpg.connect(
+        host=env.get("DB_HOST", "127.0.0.1"),
+        port=int(env.get("DB_PORT", 5432)),
+        user=env.get("DB_USER", "postgres"),
+        password=env.get("DB_PASSWORD", ""),
+        database=env["DB_DATABASE"],
+    )
+    try:
+        await conn.execute("DROP TABLE IF EXISTS id_benchmark")
+        await conn.execute("CREATE TABLE id_benchmark (id text PRIMARY KEY, created timestamptz NOT NULL DEFAULT now())")
+        start = time.perf_counter()
+        for _ in range(0, rows, batch_size):
+            # one statement per batch, like a busy table receiving many small inserts
+            await conn.execute(
+                "INSERT INTO id_benchmark (id) SELECT unnest($1::text[])", [generator() for _ in range(batch_size)]
+            )
+        elapsed = time.perf_counter() - start
+        await conn.execute("VACUUM ANALYZE id_benchmark")
+        index_size = await conn.fetchval("SELECT pg_relation_size('id_benchmark_pkey')")
+        pages = await conn.fetchval("SELECT relpages FROM pg_class WHERE relname = 'id_benchmark_pkey'")
+        return {"rows_per_second": rows / elapsed, "index_size": index_size, "index_pages": pages}
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing-db", action="store_true", help="use the DB_* database instead of a temporary cluster")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    generation = {name: measure(generator) for name, generator in GENERATORS.items()}
+    report("ID generation", generation)
+
+    inserts = {}
+    with existing_database() if args.existing_db else temporary_cluster() as env:
+        env = {**env, "DB_DATABASE": DB_NAME}
+        asyncio.run(recreate_database(env))
+        print(f"Insert {args.rows} rows in batches of {args.batch_size}")
+        for name, generator in GENERATORS.items():
+            stats = inserts[name] = asyncio.run(insert_benchmark(env, generator, args.rows, args.batch_size))
+            print(
+                f"  {name:<12} {stats['rows_per_second']:>10.0f} rows/s"
+                f"  index {stats['index_size'] / 1024 / 1024:.1f}MiB ({stats['index_pages']} pages)"
+            )
+    path = save_results("ids", {"config": vars(args), "generation": generation, "inserts": inserts})
+    print(f"Results saved to {os.path.relpath(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Import-time profile of the api package, based on ``python -X importtime``.
+
+Run with ``make importtime`` or ``python -m benchmarks.importtime [module ...]``.
+By default profiles ``main`` (what workers load) and ``api.models`` (what alembic and CLI tooling load).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.database import ROOT_DIR
+from benchmarks.utils import format_time, save_results
+
+MARKER = "-- importtime start --"
+DEFAULT_MODULES = ("main", "api.models")
+
+
+def parse(output):
+    """Parse ``-X importtime`` output into (module, depth, self, cumulative) tuples, skipping interpreter startup"""
+    lines = output.splitlines()
+    lines = lines[lines.index(MARKER) + 1 :] if MARKER in lines else lines
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(self_time) / 1e6, int(cumulative) / 1e6))
+    return imports
+
+
+def profile(module, repeat):
+    """Import the module in a fresh interpreter, keeping the fastest of several runs"""
+    code = f"import sys; print({MARKER!r}, file=sys.stderr, flush=True); import {module}"
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        )
+        imports = parse(result.stderr)
+        total = sum(cumulative for _, depth, _, cumulative in imports if depth == 0)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    return best
+
+
+def summarize(imports, top):
+    packages = defaultdict(float)
+    for name, _, self_time, _ in imports:
+        packages[name.partition(".")[0]] += self_time
+    return {
+        "packages": sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top],
+        "modules": sorted(((name, self_time) for name, _, self_time, _ in imports), key=lambda item: item[1], reverse=True)[
+            :top
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module, the fastest one is reported")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    results = {}
+    for module in args.modules:
+        total, imports = profile(module, args.repeat)
+        summary = summarize(imports, args.top)
+        results[module] = {"total": total, "imports": len(imports), **summary}
+        print(f"{module}: {format_time(total)} ({len(imports)} modules)")
+        print("  by package (self time)")
+        for name, self_time in summary["packages"]:
+            print(f"    {name:<40} {format_time(self_time):>10}")
+        print("  slowest modules (self time)")
+        for name, self_time in summary["modules"]:
+            print(f"    {name:<40} {format_time(self_time):>10}")
+    print(f"Results saved to {os.path.relpath(save_results('importtime', {'config': vars(args), 'modules': results}))}")
+
+
+if __name__ == "__main__":
+    main()
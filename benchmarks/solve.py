@@ -0,0 +1,85 @@
+"""Solve path: the single-statement Question.solve against the previous load-the-row-and-write-back approach.
+
+Run with ``python -m benchmarks.solve`` to use a temporary initdb cluster, or with ``--existing-db``
+to use the database configured by DB_* variables.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from api import models, utils
+from benchmarks.database import existing_database, prepare_database, seed, temporary_cluster
+from benchmarks.utils import format_time, percentile, save_results
+
+
+async def load_and_update(question_id, answer, email):
+    # what submit_solve did before: load the full row (plus related data), then write the whole array back
+    question = await utils.database.get_object(models.Question, question_id)
+    if question.answer != answer:
+        return False
+    question.solutions.append(email)
+    question.solutions = list(set(question.solutions))
+    await question.update(solutions=question.solutions).apply()
+    return True
+
+
+async def single_statement(question_id, answer, email):
+    result = await models.Question.solve(question_id, answer, email)
+    return bool(result and result.correct)
+
+
+IMPLEMENTATIONS = {"load_and_update": load_and_update, "single_statement": single_statement}
+
+
+async def run_implementation(func, data, concurrency, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            question_id, answer = random.choice(data["questions"])
+            start = time.perf_counter()
+            await func(question_id, answer, random.choice(data["emails"]))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"throughput": len(latencies) / elapsed, "p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+async def run(args):
+    import main  # settings are read from the environment prepared above
+
+    app = main.get_app()
+    results = {}
+    async with app.router.lifespan_context(app):
+        for name, func in IMPLEMENTATIONS.items():
+            data = await seed(args.users, args.questions, comments=0, solutions=args.solutions)
+            stats = results[name] = await run_implementation(func, data, args.concurrency, args.duration)
+            print(
+                f"{name:<18} {stats['throughput']:>8.1f} solves/s  p50 {format_time(stats['p50'])}"
+                f"  p99 {format_time(stats['p99'])}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing-db", action="store_true", help="use the DB_* database instead of a temporary cluster")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=100, help="few questions, as solves cluster on popular ones")
+    parser.add_argument("--solutions", type=int, default=50, help="initial solutions per question")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per implementation")
+    args = parser.parse_args()
+    with existing_database() if args.existing_db else temporary_cluster() as env:
+        prepare_database(env)
+        results = asyncio.run(run(args))
+    print(f"Results saved to {save_results('solve', {'config': vars(args), 'implementations': results})}")
+
+
+if __name__ == "__main__":
+    main()
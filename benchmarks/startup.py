@@ -0,0 +1,93 @@
+"""Gunicorn startup time and memory with and without preload_app.
+
+Memory is reported as PSS (proportional set size), which splits pages shared copy-on-write between processes,
+so it shows what the workers really cost. Linux only.
+
+Run with ``python -m benchmarks.startup`` to use a temporary initdb cluster, or with ``--existing-db``
+to use the database configured by DB_* variables.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import tempfile
+import time
+
+from benchmarks.database import ROOT_DIR, existing_database, get_free_port, prepare_database, temporary_cluster
+from benchmarks.utils import save_results
+
+READY_LINE = "Application startup complete"
+
+
+def get_children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def get_memory(pid):
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                memory[key.lower()] = int(value.split()[0]) * 1024
+    return memory
+
+
+def run_gunicorn(env, preload, workers, timeout=120):
+    with tempfile.TemporaryDirectory(prefix="interviewprepare-metrics-") as metrics_dir:
+        env = {
+            **os.environ,
+            **env,
+            "PRELOAD_APP": str(preload).lower(),
+            "WORKERS": str(workers),
+            "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+        }
+        command = ["gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{get_free_port()}", "main:app"]
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stderr=subprocess.PIPE, text=True)
+        try:
+            ready = 0
+            while ready < workers:
+                line = process.stderr.readline()
+                if not line or time.perf_counter() - start > timeout:
+                    raise RuntimeError("gunicorn failed to start")
+                ready += READY_LINE in line
+            startup_time = time.perf_counter() - start
+            time.sleep(1)  # let workers settle
+            pids = [process.pid] + get_children(process.pid)
+            memory = [get_memory(pid) for pid in pids]
+            return {
+                "startup_time": startup_time,
+                "rss": sum(item["rss"] for item in memory),
+                "pss": sum(item["pss"] for item in memory),
+                "processes": len(pids),
+            }
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.communicate(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing-db", action="store_true", help="use the DB_* database instead of a temporary cluster")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    results = {}
+    with existing_database() if args.existing_db else temporary_cluster() as env:
+        env = prepare_database(env)
+        for mode, preload in (("no_preload", False), ("preload", True)):
+            stats = results[mode] = run_gunicorn(env, preload, args.workers)
+            print(
+                f"{mode:<12} startup {stats['startup_time']:.2f}s  RSS {stats['rss'] / 1024 / 1024:.1f}MiB"
+                f"  PSS {stats['pss'] / 1024 / 1024:.1f}MiB  ({stats['processes']} processes)"
+            )
+    print(f"Results saved to {save_results('startup', {'config': vars(args), 'modes': results})}")
+
+
+if __name__ == "__main__":
+    main()
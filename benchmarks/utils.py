@@ -0,0 +1,54 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(func, number=10000, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f}us"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+def report(title, results):
+    print(title)
+    width = max(map(len, results))
+    for name, stats in results.items():
+        print(f"  {name:<{width}}  best {format_time(stats['best'])}  median {format_time(stats['median'])}")
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name, results, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    revision = git_revision()
+    path = os.path.join(directory, f"{name}-{revision}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump({"benchmark": name, "revision": revision, "timestamp": time.time(), "results": results}, f, indent=2)
+    return path
@@ -1,5 +1,58 @@
+import gc
 import multiprocessing
+import os
+import shutil
+import tempfile
+
+# metrics of all workers are aggregated through files in this directory
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "interviewprepare-metrics"))
+
+from api.settings import Settings  # noqa: E402: metrics directory must be set before any imports of the app
+
+settings = Settings()
 
 bind = "0.0.0.0:8000"
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = settings.workers or multiprocessing.cpu_count() * 2 + 1
 worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in master, workers share its memory copy-on-write. DB pools are still created per worker in lifespan
+preload_app = settings.preload_app
+
+# collections during import would touch objects which are about to be shared. The config is executed again on reload
+# (SIGHUP), but when_ready isn't called then: the app is imported and frozen already, so leave gc alone
+if preload_app and not gc.get_freeze_count():
+    gc.disable()
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    if preload_app:
+        from api import utils
+
+        utils.routing.report_build_times(server.log)
+        # the app is imported by now and workers are not forked yet: move everything to the permanent generation,
+        # so that gc in workers doesn't write to (and copy) pages inherited from master
+        gc.collect()
+        gc.freeze()
+        gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()  # in case gc was disabled in master, workers must never run without it
+
+
+def post_worker_init(worker):
+    if not preload_app:  # each worker imports the app itself
+        from api import utils
+
+        utils.routing.report_build_times(worker.log)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
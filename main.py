@@ -6,6 +6,7 @@ from fastapi.requests import HTTPConnection
 from starlette.middleware.cors import CORSMiddleware
 
 from api import settings as settings_module
+from api import utils
 from api.settings import Settings
 from api.views import router
 
@@ -34,7 +35,15 @@ def get_app():
     async def lifespan(app: FastAPI):
         app.ctx_token = settings_module.settings_ctx.set(app.settings)  # for events context
         await settings.init()
+        await utils.policies.settings_cache.start(settings.connection_str, settings.settings_refresh_interval)
+        await utils.feed.live_feed.start(settings.connection_str, settings.feed_queue_size, settings.feed_heartbeat_interval)
+        if app.comment_buffer:
+            app.comment_buffer.start()
         yield
+        if app.comment_buffer:
+            await app.comment_buffer.stop()
+        await utils.feed.live_feed.stop()
+        await utils.policies.settings_cache.stop()
         await app.settings.shutdown()
         settings_module.settings_ctx.reset(app.ctx_token)
 
@@ -46,6 +55,9 @@ def get_app():
         lifespan=lifespan,
     )
     app.settings = settings
+    app.comment_buffer = None
+    if settings.comment_write_mode == "buffered":
+        app.comment_buffer = utils.comments.CommentBuffer(settings.comment_flush_interval, settings.comment_buffer_max_size)
     app.include_router(router)
     app.add_middleware(
         CORSMiddleware,
@@ -55,12 +67,33 @@ def get_app():
         allow_headers=["*"],
         expose_headers=["Content-Disposition"],
     )
+    app.add_middleware(
+        utils.compression.CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
+    if settings.metrics_enabled:
+        app.add_middleware(utils.metrics.MetricsMiddleware)
+        app.add_route("/metrics", utils.metrics.metrics_endpoint, include_in_schema=False)
+    if settings.profiling_enabled:
+        app.add_middleware(
+            utils.profiling.ProfilingMiddleware,
+            slow_request_threshold=settings.slow_request_threshold,
+            n_plus_one_threshold=settings.n_plus_one_threshold,
+            log_file=settings.slow_request_log,
+            max_bytes=settings.slow_request_log_max_bytes,
+            backup_count=settings.slow_request_log_backups,
+        )
 
     app.add_middleware(RawContextMiddleware)
 
     if settings.openapi_path:
         with open(settings.openapi_path) as f:
             app.openapi_schema = json.loads(f.read())
+        utils.compression.serve_precompressed(app, app.openapi_url, utils.serialization.dumps(app.openapi_schema))
+    utils.routing.warmup(app)
     return app
 
 